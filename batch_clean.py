@@ -0,0 +1,261 @@
+"""Clean many raw survey exports from the command line.
+
+Example:
+    python batch_clean.py --type vce --output cleaned/ "exports/*.csv"
+
+Without --type each file's survey type is detected from its header.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import partial
+
+from data_quality import QualityReport, write_quality
+from detect_survey import AUTO, resolve_survey_type
+from incremental import clean_incremental, forget_index
+from output_formats import CSV, EXTENSIONS, output_format, stream_clean_to_file, write_cleaned
+from parallel_clean import clean_parallel
+from profiling import NO_PROFILER, Profiler
+from result_cache import ResultCache
+from schema_files import list_schemas, load_schema
+from school_registry import load_schools
+from survey_io import STREAMING_THRESHOLD_BYTES
+from surveys import SURVEYS, run_survey
+
+
+def expand_inputs(patterns) -> list:
+    """Expand files and glob patterns into a sorted list of unique paths."""
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return sorted(set(paths))
+
+
+def output_path(input_file: str, output_dir: str, fmt: str = CSV) -> str:
+    """Return where the cleaned copy of `input_file` is written."""
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, f"{stem}_cleaned{EXTENSIONS[fmt]}")
+
+
+def colliding_outputs(input_files: list, output_dir: str, fmt: str = CSV) -> dict:
+    """Return {output file: input files} for outputs more than one input would be written to.
+
+    Outputs are named after the input's file name alone, so `term1/export.csv`
+    and `term2/export.csv` would overwrite each other.
+    """
+    inputs = {}
+    for input_file in input_files:
+        inputs.setdefault(os.path.normcase(output_path(input_file, output_dir, fmt)), []).append(input_file)
+    return {save_path: files for save_path, files in inputs.items() if len(files) > 1}
+
+
+def profile_path(save_path: str) -> str:
+    """Return where the timing report of a cleaned file is written."""
+    return os.path.splitext(save_path)[0] + ".profile.json"
+
+
+def clean_to_file(survey_type: str, input_file: str, save_path: str, profiler=None, quality=None,
+                  shards: int = None) -> int:
+    """Clean an export into `save_path`, streaming large files, and return the rows written.
+
+    The output format follows the extension of `save_path`. `quality`, a
+    QualityReport, collects the data-quality counts. With `shards` the rows
+    are cleaned in that many worker processes instead of streamed.
+    """
+    if shards:
+        cleaned_df = clean_parallel(survey_type, input_file, shards, profiler, quality)
+        write_cleaned(survey_type, cleaned_df, save_path, profiler)
+        return len(cleaned_df)
+
+    if os.path.getsize(input_file) > STREAMING_THRESHOLD_BYTES:
+        return stream_clean_to_file(survey_type, input_file, save_path, profiler=profiler, quality=quality)
+
+    cleaned_df = run_survey(survey_type, input_file, profiler=profiler, quality=quality).frame
+    write_cleaned(survey_type, cleaned_df, save_path, profiler)
+    return len(cleaned_df)
+
+
+def clean_one(survey_type: str, input_file: str, output_dir: str, profile: bool = False,
+              cprofile: bool = False, incremental: bool = False, use_cache: bool = True, fmt: str = CSV,
+              shards: int = None) -> tuple:
+    """Clean a single export and return (output file, survey type, rows written, seconds).
+
+    The header is checked against `survey_type` (or used to detect it when
+    it is AUTO) before any of the body is parsed. With `profile` (or
+    `cprofile`, which adds a cProfile capture) a per-stage timing report is
+    written next to the output as JSON. With `incremental` only responses
+    the output does not have yet are cleaned and appended, and the rows
+    written are just those. Otherwise an export cleaned before is copied
+    from the result cache unless `use_cache` is False, and a data-quality
+    report is written next to the output as `<name>_cleaned.quality.json`.
+    `fmt` is "csv", "parquet" or "feather"; incremental runs append, so
+    they are CSV only. `shards` splits the rows across that many processes.
+    """
+    start = time.perf_counter()
+    survey_type = resolve_survey_type(survey_type, input_file)
+    save_path = output_path(input_file, output_dir, fmt)
+    profiler = Profiler(cprofile=cprofile) if profile or cprofile else None
+    quality = None
+    if not incremental:
+        # The output is rewritten in full, so an incremental index next to it would be stale
+        forget_index(save_path)
+
+    with profiler or nullcontext():
+        if incremental:
+            rows = clean_incremental(survey_type, input_file, save_path, profiler=profiler).new_rows
+        elif use_cache:
+            cache = ResultCache()
+            with (profiler or NO_PROFILER).stage("cache lookup"):
+                key = cache.key(survey_type, input_file, output_format(save_path))
+                rows = cache.get(key, save_path)
+                quality = cache.quality(key) if rows is not None else None
+            if rows is None:
+                collected = QualityReport()
+                rows = clean_to_file(survey_type, input_file, save_path, profiler, collected, shards)
+                quality = collected.report()
+                cache.put(key, save_path, rows, quality)
+        else:
+            collected = QualityReport()
+            rows = clean_to_file(survey_type, input_file, save_path, profiler, collected, shards)
+            quality = collected.report()
+
+    if quality is not None:
+        write_quality(save_path, quality, input_file, survey_type)
+
+    if profiler:
+        with open(profile_path(save_path), "w", encoding="utf-8") as handle:
+            json.dump({"input_file": input_file, "survey_type": survey_type, **profiler.report()}, handle, indent=2)
+
+    return save_path, survey_type, rows, time.perf_counter() - start
+
+
+def warm_up_worker():
+    """Read every survey schema and the school registry in a new worker process.
+
+    Run as a pool's `initializer`. Starting the worker has already imported
+    this module, and with it pandas and the cleaners, so after this its
+    first file waits for nothing but the clean itself.
+    """
+    for name in list_schemas():
+        load_schema(name)
+    load_schools()
+
+
+def warm_pool(workers: int) -> ProcessPoolExecutor:
+    """Return a process pool of `workers` processes, started and warmed up now rather than on the first file."""
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up_worker)
+
+    # Workers are started as tasks arrive, so hand each a trivial one
+    for _ in range(workers):
+        pool.submit(os.getpid)
+    return pool
+
+
+def clean_batch(survey_type: str, input_files: list, output_dir: str, workers: int = None,
+                profile: bool = False, cprofile: bool = False, incremental: bool = False,
+                use_cache: bool = True, fmt: str = CSV, split: bool = False) -> tuple:
+    """Clean `input_files` across a process pool.
+
+    With `split` the files are cleaned one after another instead, each with
+    its rows split across the pool (see parallel_clean), which suits a few
+    very large exports. Returns a list of (input file, output file, survey
+    type, rows, seconds) for the files that were cleaned and a list of
+    (input file, error message) for the rest.
+
+    Raises ValueError, before anything is cleaned, when two inputs would be
+    written to the same output file.
+    """
+    collisions = colliding_outputs(input_files, output_dir, fmt)
+    if collisions:
+        clashes = "; ".join(" and ".join(files) for files in collisions.values())
+        raise ValueError(f"These inputs would overwrite each other's cleaned file, so rename one of each: {clashes}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    cleaned, failures = [], []
+
+    def finished(input_file, outcome):
+        try:
+            save_path, cleaned_type, rows, seconds = outcome()
+        except Exception as e:
+            failures.append((input_file, f"{type(e).__name__}: {e}"))
+            print(f"FAILED  {input_file}: {e}", file=sys.stderr)
+        else:
+            cleaned.append((input_file, save_path, cleaned_type, rows, seconds))
+            print(f"cleaned {input_file} -> {save_path} ({cleaned_type}, {rows} rows, {seconds:.2f}s)")
+
+    options = (output_dir, profile, cprofile, incremental, use_cache, fmt)
+    if split:
+        shards = workers or os.cpu_count() or 1
+        for input_file in input_files:
+            finished(input_file, partial(clean_one, survey_type, input_file, *options, shards))
+        return cleaned, failures
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(clean_one, survey_type, input_file, *options): input_file for input_file in input_files}
+        for future in as_completed(futures):
+            finished(futures[future], future.result)
+
+    return cleaned, failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Clean a batch of raw KIOSC survey exports.")
+    parser.add_argument("inputs", nargs="+", help="CSV files or glob patterns such as 'exports/*.csv'")
+    parser.add_argument("--type", "-t", default=AUTO, choices=[AUTO, *sorted(SURVEYS)],
+                        help="survey type of every input (default: detect each file's type)")
+    parser.add_argument("--output", "-o", required=True, help="directory the cleaned files are written to")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--profile", action="store_true",
+                        help="write a per-stage timing report next to each output as <name>_cleaned.profile.json")
+    parser.add_argument("--cprofile", action="store_true", help="like --profile, with a cProfile capture added")
+    parser.add_argument("--incremental", "-i", action="store_true",
+                        help="only clean responses not already in the output and append them")
+    parser.add_argument("--no-cache", action="store_true", help="clean every file even if it was cleaned before")
+    parser.add_argument("--format", "-f", default=CSV, choices=list(EXTENSIONS),
+                        help="file format of the cleaned files (default: csv)")
+    parser.add_argument("--split", action="store_true",
+                        help="clean one file at a time with its rows split across the workers, for very large exports")
+    args = parser.parse_args(argv)
+
+    if args.incremental and args.format != CSV:
+        parser.error("--incremental appends to CSV files, so it cannot be used with --format " + args.format)
+    if args.incremental and args.split:
+        parser.error("--incremental only cleans new rows, so it cannot be used with --split")
+
+    input_files = expand_inputs(args.inputs)
+    if not input_files:
+        parser.error("no input files matched")
+
+    collisions = colliding_outputs(input_files, args.output, args.format)
+    if collisions:
+        parser.error("inputs with the same file name would overwrite each other's cleaned file: " + "; ".join(
+            f"{' and '.join(files)} -> {save_path}" for save_path, files in collisions.items()
+        ))
+
+    start = time.perf_counter()
+    cleaned, failures = clean_batch(
+        args.type, input_files, args.output, args.workers, args.profile, args.cprofile, args.incremental,
+        not args.no_cache, args.format, args.split,
+    )
+    elapsed = time.perf_counter() - start
+
+    rows = sum(row_count for _, _, _, row_count, _ in cleaned)
+    print(
+        f"\n{len(cleaned)} of {len(input_files)} files cleaned, {rows} rows in {elapsed:.2f}s "
+        f"({rows / elapsed if elapsed else 0:.0f} rows/sec), {len(failures)} failed"
+    )
+    for input_file, error in failures:
+        print(f"  {input_file}: {error}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Synthetic exports and timing runs for the survey cleaners."""
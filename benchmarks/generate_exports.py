@@ -0,0 +1,251 @@
+"""Write synthetic raw exports that look like the real ones.
+
+Each file has the 4 metadata rows, a question row and an option row laid
+out so that the merged column names (including repeated labels such as
+`Other_136`) match the survey's schema, one-hot answer blocks with the
+occasional double tick, 'Other' comments and `First Name` values carrying
+`#NNN` record numbers.
+
+Example:
+    python -m benchmarks.generate_exports vces exports/vces_10k.csv --rows 10000
+"""
+import argparse
+import csv
+import random
+
+from school_registry import load_schools
+from survey_schema import load_schema
+
+# Columns every export starts with
+IDENTITY_BLOCK = [('Survey Start', ''), ('First Name', ''), ('Last Name', '')]
+
+GENDER_BLOCK = [
+    ('Which of the following most accurately describes your gender? ', 'Female'), ('', 'Male'), ('', 'Non-binary'),
+    ('', 'Let me explain'), ('', 'Let me explain Comments'), ('', 'Rather not say'),
+]
+
+YEAR_LEVEL_BLOCK = [('What year level are you?', 'Year 5'), *[('', f'Year {year}') for year in range(6, 13)]]
+
+DELIVERY_MODE_BLOCK = [
+    ('How was your KIOSC program delivered?', 'Onsite (face to face at KIOSC)'),
+    ('', 'Offsite (face to face at your school by your teachers OR a KIOSC facilitator)'),
+    ('', 'Online (delivered zia Zoom, Webex, Teams etc)'),
+    ('', 'Immersion (delivered at an industry site)'),
+]
+
+RATING_QUESTIONS = [
+    'How much did you enjoy the sessions today?',
+    'How much do you think you have learnt today?',
+    'I learnt something new today',
+    'The program I did motivated me to explore new ideas and concepts',
+    'I used technology to help me learn',
+    'I had the opportunity to collaborate with other students',
+    'I learnt about industries that use science, technology, engineering, or maths (referred to as STEM) in my local area',
+]
+
+STATEMENTS = [
+    'I would recommend this activity to another student.',
+    'The activity introduced me to new topics and ideas.',
+    'The activity made me think hard / carefully.',
+    'The activity was different to regular class at school.',
+]
+
+# Registry schools only the Discovery form lists
+DISCOVERY_ONLY_SCHOOLS = {'Elwood College', 'Viewbank College'}
+
+# Values written into rating and free-text cells
+ANSWERS = ['Strongly agree', 'Agree', 'Disagree', '', '5', '3']
+COMMENTS = ['Bayswater SC', 'my school', 'Some Program', 'Prefer to self describe']
+
+
+def _plain_options(survey_type: str, field: str) -> list:
+    """Return the (column, label) pairs of a schema field's column options."""
+    schema_field = next(f for f in load_schema(survey_type)["fields"] if f["name"] == field)
+    return [
+        (option, option) if isinstance(option, str) else tuple(option)
+        for option in schema_field["options"] if not isinstance(option, dict)
+    ]
+
+
+def _fill(columns: list, width: int) -> list:
+    """Pad `columns` with unrelated questions until it is `width` columns wide."""
+    return columns + [(f'Filler q{i}', '') for i in range(len(columns), width)]
+
+
+def _place(width: int, pinned: dict, floating: list, filler: str) -> list:
+    """Lay out `width` options, with `pinned` ones at fixed offsets and the rest in order."""
+    slots = [None] * width
+    for offset, option in pinned.items():
+        slots[offset] = option
+
+    floating = iter(floating)
+    unused = 0
+    for i in range(width):
+        if slots[i] is None:
+            option = next(floating, None)
+            if option is None:
+                unused += 1
+                option = ('', f'{filler} {unused}')
+            slots[i] = option
+
+    if next(floating, None) is not None:
+        raise ValueError(f"more options than the {width} slots available")
+    return slots
+
+
+def _rating_block(last_question: str) -> list:
+    return [
+        *[(question, '') for question in RATING_QUESTIONS],
+        ('If given the opportunity, would you like to attend another KIOSC program?', 'Yes'), ('', 'No'),
+        (last_question, ''),
+    ]
+
+
+def discovery_layout() -> list:
+    """Return the (question, option) header cells of a Discovery export."""
+    programs = next(
+        option["each_containing"] for field in load_schema("discovery")["fields"] if field["name"] == "Program Name"
+        for option in field["options"] if isinstance(option, dict)
+    )
+    bayswater = load_schools()[0]
+    school_field = next(field for field in load_schema("discovery")["fields"] if field["name"] == "School")
+    schools = school_field["options"][0]["order"]
+
+    columns = _fill(IDENTITY_BLOCK + GENDER_BLOCK, 16)
+    columns += [('What program did you attend?', programs[0]), *[('', program) for program in programs[1:]]]
+    columns += [('', 'Other'), ('', 'Other Comments'), ('Another q', ''), ('Yet another q', '')]
+    columns.append(
+        ("What school are you from? (If not listed, choose 'Other', and type your school name)", bayswater)
+    )
+
+    # Some schools are listed twice, as in the real form, so their positions
+    # must give the `_NNN` suffixes the schema (and the original cleaner) name
+    columns += [('', school.split('_')[0]) for school in schools[:9:2]]
+    start = len(columns)
+    pinned = {
+        int(school.rsplit('_', 1)[1]) - start: ('', school.split('_')[0])
+        for school in schools if '_' in school and int(school.rsplit('_', 1)[1]) >= start
+    }
+    floating = sorted(school for school in schools if '_' not in school and school != 'Fairhills High School')
+    columns += _place(193 - start, pinned, [('', school) for school in floating], 'Unlisted School')
+
+    columns += [('', 'Other'), ('', 'Other Comments'), *YEAR_LEVEL_BLOCK, *DELIVERY_MODE_BLOCK]
+    columns += _rating_block('The learning program I completed at the KIOSC met the Learning Intentions')
+    return columns
+
+
+def vce_layout() -> list:
+    """Return the (question, option) header cells of a VCE export."""
+    programs = [label for _, label in _plain_options("vce", "Program Name")[:-1]]
+    schools = [school for school in load_schools()[1:] if school not in DISCOVERY_ONLY_SCHOOLS]
+
+    columns = _fill(IDENTITY_BLOCK + GENDER_BLOCK, 16)
+    columns += [('What\xa0program did you attend?', programs[0]), *[('', program) for program in programs[1:]]]
+    columns += [('', 'Other'), ('', 'Other Comments')]
+    columns.append(('What school are you from?', 'Bayswater Secondary College'))
+    columns += [('', school) for school in schools]
+    columns = _place(156, {}, columns, 'Unlisted Place')
+
+    columns += [('', 'Other'), ('', 'Other Comments'), *YEAR_LEVEL_BLOCK, *DELIVERY_MODE_BLOCK]
+    columns += _rating_block('The learning program I completed at the KIOSC\xa0 met the Learning Intentions')
+    return columns
+
+
+def vces_layout() -> list:
+    """Return the (question, option) header cells of a VCES export."""
+    programs = [label for _, label in _plain_options("vces", "Program Name")[:-1]]
+    schools = [school for school in load_schools()[1:] if school not in DISCOVERY_ONLY_SCHOOLS]
+
+    columns = _fill(IDENTITY_BLOCK, 12)
+    columns += [('What is your gender?', 'Female'), ('', 'Male'), ('', 'Other'), ('', 'Rather not say')]
+    columns = _fill(columns, 19)
+    columns += [('What School are you from?', 'Bayswater Secondary College'), *[('', school) for school in schools]]
+    columns += [('', 'Other'), ('', 'Other Comments')]
+    columns += [('What is your year level at school?', 'Prep'), *[('', f'Year {year}') for year in range(5, 13)]]
+    columns += [('Do you identify as Aboriginal or Torres Strait Islander?', 'Yes'), ('', 'No'), ('', 'Rather not say')]
+    columns = _fill(columns, 151)
+    for statement in STATEMENTS:
+        columns += [
+            (statement, 'Strongly agree'), ('', 'Agree'), ('', 'Neither agree nor disagree '), ('', 'Disagree'),
+            ('', 'Strongly disagree.'),
+        ]
+    columns += [('What program did you complete today?', programs[0]), *[('', program) for program in programs[1:]]]
+    columns += [('', 'Other'), ('', 'Other Comments')]
+    return columns
+
+
+LAYOUTS = {"discovery": discovery_layout, "vce": vce_layout, "vces": vces_layout}
+
+
+def one_hot_blocks(columns: list) -> list:
+    """Group the positions of each question's one-hot options."""
+    blocks, current = [], None
+    for i, (question, option) in enumerate(columns):
+        if question and option:
+            current = [i]
+            blocks.append(current)
+        elif not question and option and current is not None:
+            current.append(i)
+        else:
+            current = None
+    return blocks
+
+
+def write_export(survey_type: str, path: str, rows: int, extra_columns: int = 0, seed: int = 0):
+    """Write a raw export of `rows` responses to `path`.
+
+    `extra_columns` appends that many free-text questions the cleaners do
+    not read, to make the file wider. The same arguments always give the
+    same file.
+    """
+    rng = random.Random(seed)
+    columns = LAYOUTS[survey_type]()
+    blocks = one_hot_blocks(columns)
+    columns += [(f'Extra question {i + 1}', '') for i in range(extra_columns)]
+
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        for line in [f'Survey,{survey_type}', 'Exported,2024-05-01', 'Filter,None', f'Rows,{rows}']:
+            handle.write(line + '\r\n')
+        writer.writerow([question for question, _ in columns])
+        writer.writerow([option for _, option in columns])
+
+        for r in range(rows):
+            row = [''] * len(columns)
+            row[0] = '2024-0%d-1%d 09:%02d' % (rng.randint(1, 9), rng.randint(0, 9), rng.randint(0, 59))
+
+            # A few responses have no first name, or one without a record number
+            x = rng.random()
+            row[1] = '' if x < 0.03 else ('Student' if x < 0.06 else f'Student #{1000 + r}')
+
+            for block in blocks:
+                k = rng.random()
+                if k < 0.1:
+                    continue
+                for position in rng.sample(block, 2 if k > 0.93 else 1):
+                    row[position] = '1'
+                    if columns[position][1] in ('Other', 'Let me explain') and position + 1 < len(columns):
+                        row[position + 1] = rng.choice(COMMENTS)
+
+            for i, (question, option) in enumerate(columns):
+                if question and not option and i > 2 and not question.startswith('Filler'):
+                    row[i] = rng.choice(ANSWERS)
+
+            writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic raw survey export.")
+    parser.add_argument("survey_type", choices=sorted(LAYOUTS))
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--rows", "-r", type=int, default=10_000, help="number of responses (default: 10000)")
+    parser.add_argument("--extra-columns", "-x", type=int, default=0,
+                        help="unread free-text columns appended to widen the file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_export(args.survey_type, args.output, args.rows, args.extra_columns, args.seed)
+
+
+if __name__ == "__main__":
+    main()
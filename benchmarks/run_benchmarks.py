@@ -0,0 +1,205 @@
+"""Time each survey cleaner end to end on synthetic exports and keep the results.
+
+Example:
+    python -m benchmarks.run_benchmarks --rows 1000 10000 --repeat 3
+
+Every run appends one JSON line per survey, size and CSV engine to
+benchmarks/results.jsonl and prints the change against the last stored run
+with the same settings, so a slowdown shows up straight away. Each export is
+timed on every available CSV engine, and the report shows how much faster
+than the C parser the others are. With `--workers 1 4 8` it is also cleaned
+with its rows split across that many processes (see parallel_clean), and the
+report shows the speed-up over one process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate_exports import write_export
+from csv_engines import C, available_engines, using_engine
+from output_formats import write_cleaned
+from parallel_clean import clean_parallel
+from surveys import SURVEYS
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def current_commit() -> str:
+    """Return the short hash of the checked-out commit, or None outside git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_FILE),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_clean(survey_type: str, input_file: str, repeat: int, workers: int = 1) -> dict:
+    """Clean `input_file` `repeat` times and once more under tracemalloc.
+
+    The fastest run is kept, as it is the least disturbed by the rest of the
+    machine. Peak memory is measured separately because tracing slows the
+    run down; with several `workers` it covers the parent process only.
+    Saving the result as CSV is timed on its own.
+    """
+    if workers > 1:
+        def clean(path):
+            return clean_parallel(survey_type, path, workers)
+    else:
+        clean = SURVEYS[survey_type].clean
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = clean(input_file)
+        times.append(time.perf_counter() - start)
+
+    write_times = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            write_cleaned(survey_type, frame, os.path.join(scratch, "cleaned.csv"))
+            write_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        clean(input_file)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(times), "write_seconds": min(write_times), "peak_bytes": peak, "rows_out": len(frame)}
+
+
+def run_benchmarks(survey_types: list, sizes: list, extra_columns: int = 0, repeat: int = 3,
+                   data_dir: str = None, engines: list = None, workers: list = (1,)) -> list:
+    """Benchmark every survey type at every size, CSV engine and worker count and return one record each.
+
+    Exports are generated into `data_dir` (a temporary folder by default) and
+    reused when a file with the same settings is already there.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = data_dir or scratch
+        os.makedirs(data_dir, exist_ok=True)
+
+        records = []
+        for survey_type in survey_types:
+            for rows in sizes:
+                input_file = os.path.join(data_dir, f"{survey_type}_{rows}_x{extra_columns}.csv")
+                if not os.path.exists(input_file):
+                    write_export(survey_type, input_file, rows, extra_columns)
+
+                for engine in engines or available_engines():
+                    for count in workers:
+                        with using_engine(engine):
+                            result = time_clean(survey_type, input_file, repeat, count)
+                        records.append({
+                            "survey": survey_type,
+                            "rows": rows,
+                            "extra_columns": extra_columns,
+                            "engine": engine,
+                            "workers": count,
+                            "file_bytes": os.path.getsize(input_file),
+                            **result,
+                            "rows_per_sec": rows / result["seconds"] if result["seconds"] else None,
+                        })
+
+    return records
+
+
+def load_results(path: str = RESULTS_FILE) -> list:
+    """Read every stored benchmark record, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def save_results(records: list, path: str = RESULTS_FILE):
+    with open(path, "a", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record) + "\n")
+
+
+def previous_result(history: list, record: dict) -> dict:
+    """Return the latest stored record benchmarked with the same settings, if any."""
+    same = ("survey", "rows", "extra_columns")
+    matches = [
+        old for old in history
+        if all(old.get(key) == record[key] for key in same) and old.get("engine", C) == record["engine"]
+        and old.get("workers", 1) == record["workers"]
+    ]
+    return matches[-1] if matches else None
+
+
+def _speedup(baseline: dict, record: dict) -> str:
+    return f"{baseline['seconds'] / record['seconds']:.2f}x" if baseline and record["seconds"] else ""
+
+
+def format_report(records: list, history: list) -> str:
+    """Tabulate the records against the C parser, against one process and against the last run."""
+    by_engine = {
+        (record["survey"], record["rows"], record["workers"]): record for record in records if record["engine"] == C
+    }
+    by_workers = {
+        (record["survey"], record["rows"], record["engine"]): record for record in records if record["workers"] == 1
+    }
+    lines = [
+        f"{'survey':<10} {'rows':>8} {'engine':<8} {'workers':>7} {'seconds':>9} {'write s':>8} {'rows/sec':>10} "
+        f"{'peak MB':>8} {'vs c':>6} {'vs 1w':>6}  vs last run"
+    ]
+    for record in records:
+        speedup = _speedup(by_engine.get((record["survey"], record["rows"], record["workers"])), record)
+        scaling = _speedup(by_workers.get((record["survey"], record["rows"], record["engine"])), record)
+        before = previous_result(history, record)
+        change = ""
+        if before:
+            change = f"{(record['seconds'] / before['seconds'] - 1) * 100:+.1f}% time ({before.get('commit') or '?'})"
+        lines.append(
+            f"{record['survey']:<10} {record['rows']:>8} {record['engine']:<8} {record['workers']:>7} "
+            f"{record['seconds']:>9.3f} {record['write_seconds']:>8.3f} {record['rows_per_sec']:>10.0f} "
+            f"{record['peak_bytes'] / 1e6:>8.1f} {speedup:>6} {scaling:>6}  {change}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the survey cleaners on synthetic exports.")
+    parser.add_argument("--surveys", "-s", nargs="+", choices=sorted(SURVEYS), default=sorted(SURVEYS))
+    parser.add_argument("--rows", "-r", nargs="+", type=int, default=[1_000, 10_000],
+                        help="export sizes to benchmark (default: 1000 10000)")
+    parser.add_argument("--extra-columns", "-x", type=int, default=0,
+                        help="unread free-text columns appended to each export")
+    parser.add_argument("--engines", "-e", nargs="+", choices=available_engines(), default=available_engines(),
+                        help="CSV engines to compare (default: every one installed)")
+    parser.add_argument("--workers", "-w", nargs="+", type=int, default=[1],
+                        help="process counts to clean each export with, splitting its rows (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per export; the fastest is kept")
+    parser.add_argument("--data-dir", help="keep the generated exports here instead of a temporary folder")
+    parser.add_argument("--label", help="note stored with the results, e.g. what changed")
+    parser.add_argument("--no-save", action="store_true", help="print the results without storing them")
+    args = parser.parse_args(argv)
+
+    history = load_results()
+    records = run_benchmarks(
+        args.surveys, args.rows, args.extra_columns, args.repeat, args.data_dir, args.engines, args.workers
+    )
+
+    run_info = {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": current_commit(),
+                "label": args.label}
+    records = [{**run_info, **record} for record in records]
+
+    print(format_report(records, history))
+    if not args.no_save:
+        save_results(records)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
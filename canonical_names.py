@@ -0,0 +1,88 @@
+"""Match free-text answers such as a typed school name to a known name.
+
+When a respondent picks 'Other' their comment is used as the answer, so the
+same school turns up as `Bayswater SC`, `bayswater secondary` and so on.
+A Canonicalizer indexes the known names by character trigrams and gives a
+typed value the name it shares the most trigrams with (Dice similarity),
+if that passes MATCH_THRESHOLD; otherwise the value is kept as typed.
+Common abbreviations are spelled out first. Each distinct value is matched
+once per process thanks to an LRU cache.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Dice similarity a match needs; below it the typed value is kept
+MATCH_THRESHOLD = 0.75
+
+# Distinct values remembered per set of known names
+MATCH_CACHE_SIZE = 4096
+
+ABBREVIATIONS = {
+    "sc": "secondary college",
+    "ps": "primary school",
+    "hs": "high school",
+    "coll": "college",
+    "sec": "secondary",
+    "prim": "primary",
+    "gs": "grammar school",
+}
+
+
+def match_key(text: str) -> str:
+    """Lower-case `text`, drop punctuation and spell out abbreviations."""
+    words = re.sub(r"[^\w]+", " ", text.casefold()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Canonicalizer:
+    """Matches text to one fixed list of known names."""
+
+    def __init__(self, names: tuple, threshold: float = MATCH_THRESHOLD):
+        self.names = names
+        self.threshold = threshold
+        self._grams = [trigrams(match_key(name)) for name in names]
+        self._index = {}
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._index.setdefault(gram, []).append(i)
+        self.match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match)
+
+    def _match(self, text: str) -> str:
+        """Return the known name `text` stands for, or `text` itself when none is close enough."""
+        grams = trigrams(match_key(text))
+        if not grams:
+            return text
+
+        shared = Counter(i for gram in grams for i in self._index.get(gram, ()))
+        best, score = None, 0.0
+        for i, count in shared.items():
+            dice = 2 * count / (len(grams) + len(self._grams[i]))
+            if dice > score:
+                best, score = i, dice
+        return self.names[best] if score >= self.threshold else text
+
+    def canonicalize(self, values: np.ndarray) -> np.ndarray:
+        """Map an array of answers through `match`, matching each distinct string once."""
+        codes, uniques = pd.factorize(values)
+        if not len(uniques):
+            return values
+        mapped = np.array([self.match(value) if isinstance(value, str) else value for value in uniques], dtype=object)
+        result = values.copy()
+        known = codes >= 0
+        result[known] = mapped[codes[known]]
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_canonicalizer(names: tuple) -> Canonicalizer:
+    """Return the shared Canonicalizer of a list of names, so its cache outlives one header."""
+    return Canonicalizer(names)
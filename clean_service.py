@@ -0,0 +1,287 @@
+"""A local HTTP service that cleans raw exports for other tools.
+
+Example:
+    python clean_service.py --port 8765 --workers 2
+    curl --data-binary @export.csv "http://127.0.0.1:8765/clean?type=vce&format=parquet" -o cleaned.parquet
+
+POST a raw export as the request body to `/clean`. `type` is a survey type
+or `auto` (the default) and `format` is csv (the default), parquet or
+feather. The cleaned file comes back as the response body, with its survey
+type and row count in the `X-Survey-Type` and `X-Rows` headers. A rejected
+export gets a 4xx status with the reason as plain text.
+
+Cleaning runs in a fixed pool of worker processes that are started, with
+pandas and the cleaners loaded, before the first request, so a request
+costs only the clean itself. At most `--workers` exports are cleaned at a
+time and `--queue` more may wait; beyond that a request is turned away
+with 503 at once. Uploads over `--max-upload-mb` are refused with 413.
+`GET /metrics` returns request counts, latency and throughput as JSON.
+
+The service listens on 127.0.0.1 only, unless --host is given.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from batch_clean import clean_one, warm_pool
+from detect_survey import AUTO
+from output_formats import CSV, EXTENSIONS
+from surveys import SURVEYS
+
+DEFAULT_PORT = 8765
+
+# Largest upload accepted, in MB
+MAX_UPLOAD_MB = 200
+
+# Requests allowed to wait for a busy worker before more are turned away
+QUEUE_LENGTH = 8
+
+# Latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+# Seconds to wait on a stalled client socket
+SOCKET_TIMEOUT = 60
+
+_COPY_BLOCK = 1024 * 1024
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+
+
+class RequestError(Exception):
+    """Raised to answer a request with an error status and message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Return the value `fraction` of the way through a sorted list (nearest rank)."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """Request counts, latencies and throughput since the service started, safe across threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.statuses = Counter()
+        self.in_flight = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.rows = 0
+        self.clean_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, status: int, seconds: float, bytes_in: int = 0, rows: int = 0, clean_seconds: float = 0.0):
+        with self._lock:
+            self.in_flight -= 1
+            self.statuses[status] += 1
+            self.rejected += status == 503
+            self.bytes_in += bytes_in
+            self.rows += rows
+            self.clean_seconds += clean_seconds
+            if status == 200:
+                self.latencies.append(seconds)
+
+    def report(self) -> dict:
+        """Return the metrics as plain data, ready to be written as JSON."""
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            latencies = sorted(self.latencies)
+            cleaned = self.statuses[200]
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "requests": sum(self.statuses.values()),
+                "by_status": {str(status): count for status, count in sorted(self.statuses.items())},
+                "in_flight": self.in_flight,
+                "rejected_busy": self.rejected,
+                "files_cleaned": cleaned,
+                "rows_cleaned": self.rows,
+                "bytes_uploaded": self.bytes_in,
+                "files_per_minute": round(60 * cleaned / uptime, 2) if uptime else 0.0,
+                "rows_per_second_cleaning": round(self.rows / self.clean_seconds) if self.clean_seconds else 0,
+                "latency_seconds": {
+                    "window": len(latencies),
+                    "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+                    "p50": round(percentile(latencies, 0.5), 4),
+                    "p95": round(percentile(latencies, 0.95), 4),
+                    "p99": round(percentile(latencies, 0.99), 4),
+                    "max": round(latencies[-1], 4) if latencies else 0.0,
+                },
+            }
+
+
+class CleaningService(ThreadingHTTPServer):
+    """An HTTP server owning the worker pool, the admission limit and the metrics."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, workers: int = None, queue: int = QUEUE_LENGTH,
+                 max_upload_bytes: int = MAX_UPLOAD_MB * 1024 * 1024):
+        super().__init__(address, CleaningHandler)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_upload_bytes = max_upload_bytes
+        self.slots = threading.BoundedSemaphore(self.workers + queue)
+        self.metrics = Metrics()
+        self.pool = warm_pool(self.workers)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class CleaningHandler(BaseHTTPRequestHandler):
+    server_version = "KIOSCCleaner/1.0"
+    timeout = SOCKET_TIMEOUT
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/metrics":
+            self.send_text(404, "Not found; POST an export to /clean or GET /metrics.")
+            return
+        body = json.dumps(self.server.metrics.report(), indent=2).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        metrics = self.server.metrics
+        metrics.begin()
+        status, bytes_in, rows, clean_seconds = 500, 0, 0, 0.0
+        try:
+            url = urlparse(self.path)
+            if url.path != "/clean":
+                raise RequestError(404, "Not found; POST an export to /clean.")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            survey_type = query.get("type", AUTO)
+            fmt = query.get("format", CSV)
+            if survey_type not in (AUTO, *SURVEYS):
+                known = ", ".join([AUTO, *sorted(SURVEYS)])
+                raise RequestError(400, f"Unknown survey type {survey_type!r}; use one of {known}.")
+            if fmt not in EXTENSIONS:
+                raise RequestError(400, f"Unknown format {fmt!r}; use one of {', '.join(EXTENSIONS)}.")
+            length = self.upload_length()
+
+            if not self.server.slots.acquire(blocking=False):
+                raise RequestError(503, "Every worker is busy and the queue is full; try again shortly.")
+            try:
+                with tempfile.TemporaryDirectory(prefix="kiosc_clean_") as work_dir:
+                    input_file = os.path.join(work_dir, "upload.csv")
+                    self.receive_upload(input_file, length)
+                    bytes_in = length
+                    try:
+                        save_path, cleaned_type, rows, clean_seconds = self.server.pool.submit(
+                            clean_one, survey_type, input_file, work_dir, fmt=fmt,
+                        ).result()
+                    except ValueError as e:
+                        raise RequestError(422, str(e).replace(input_file, "the upload"))
+                    except KeyError as e:
+                        # A column the cleaner needs is missing from the upload
+                        raise RequestError(422, f"The upload lacks a column the cleaner needs: {e}")
+                    self.send_file(save_path, fmt, cleaned_type, rows)
+                    status = 200
+            finally:
+                self.server.slots.release()
+        except RequestError as e:
+            status = e.status
+            self.send_text(e.status, str(e))
+        except Exception as e:
+            self.send_text(500, f"Cleaning failed: {type(e).__name__}: {e}")
+        finally:
+            metrics.end(status, time.perf_counter() - start, bytes_in, rows, clean_seconds)
+
+    def upload_length(self) -> int:
+        """Return the declared size of the upload, refusing a missing, empty or oversized one."""
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            raise RequestError(411, "Send the export as the request body with a Content-Length.")
+        if length <= 0:
+            raise RequestError(400, "The request body is empty; send the raw export.")
+        if length > self.server.max_upload_bytes:
+            limit = self.server.max_upload_bytes // (1024 * 1024)
+            raise RequestError(413, f"The upload is {length / 1024 / 1024:.0f} MB; the limit is {limit} MB.")
+        return length
+
+    def receive_upload(self, path: str, length: int):
+        """Copy the request body to `path` a block at a time."""
+        remaining = length
+        with open(path, "wb") as handle:
+            while remaining:
+                block = self.rfile.read(min(_COPY_BLOCK, remaining))
+                if not block:
+                    raise RequestError(400, "The upload ended before its Content-Length.")
+                handle.write(block)
+                remaining -= len(block)
+
+    def send_file(self, path: str, fmt: str, survey_type: str, rows: int):
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[fmt])
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="cleaned{EXTENSIONS[fmt]}"')
+        self.send_header("X-Survey-Type", survey_type)
+        self.send_header("X-Rows", str(rows))
+        self.end_headers()
+        with open(path, "rb") as handle:
+            shutil.copyfileobj(handle, self.wfile, _COPY_BLOCK)
+
+    def send_text(self, status: int, message: str):
+        body = (message + "\n").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "5")
+        # The body of a refused upload is not read, so the connection cannot be reused
+        self.close_connection = True
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the KIOSC cleaners over HTTP on this computer.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="exports cleaned at the same time (default: one per CPU)")
+    parser.add_argument("--queue", type=int, default=QUEUE_LENGTH,
+                        help=f"requests that may wait for a worker before more are refused (default: {QUEUE_LENGTH})")
+    parser.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD_MB,
+                        help=f"largest export accepted, in MB (default: {MAX_UPLOAD_MB})")
+    args = parser.parse_args(argv)
+
+    with CleaningService((args.host, args.port), args.workers, args.queue, args.max_upload_mb * 1024 * 1024) as server:
+        print(f"cleaning exports at http://{args.host}:{server.server_port}/clean "
+              f"with {server.workers} workers (Ctrl+C to stop)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
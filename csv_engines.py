@@ -0,0 +1,218 @@
+"""Read and write the CSV bodies with pandas' C parser or with pyarrow.
+
+pyarrow parses and converts on several threads and writes many times
+faster, so it is used whenever it is installed. `KIOSC_CSV_ENGINE=c` (or
+`set_engine("c")`) keeps to pandas. Both engines give the same frames and
+byte-identical files:
+
+* Reads take the same `read_csv` options the C parser would and load the
+  same missing values, text columns and categoricals. Skipping a set of rows
+  or keeping blank lines (incremental mode), or a file pyarrow rejects,
+  such as one with ragged rows, falls back to the C parser.
+* Writes go through pyarrow only for rows that need no quoting, in text
+  and integer columns; other rows are written by pandas in between, so quoting and
+  line endings match `to_csv`.
+
+Headers are sniffed by `survey_io.sniff_header` with the csv module, before
+either engine runs, so the header plan and its handling of NBSP and
+mojibake labels do not depend on the engine.
+"""
+import itertools
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+C = "c"
+PYARROW = "pyarrow"
+ENGINES = [C, PYARROW]
+
+# Cells read_csv loads as missing by default (its `na_values` defaults), so
+# pyarrow and the header sniffer agree with the C parser
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A",
+    "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+# Bytes pyarrow parses per batch when streaming; its chunks follow this, not a row count
+ARROW_BLOCK_BYTES = 16 * 1024 * 1024
+
+# Cells holding any of these must be quoted
+_NEEDS_QUOTES = '[,"\r\n]'
+
+
+def available_engines() -> list:
+    return [engine for engine in ENGINES if engine != PYARROW or pa is not None]
+
+
+def _default_engine() -> str:
+    wanted = os.environ.get("KIOSC_CSV_ENGINE")
+    if wanted in available_engines():
+        return wanted
+    return PYARROW if pa is not None else C
+
+
+_engine = _default_engine()
+
+
+def get_engine() -> str:
+    return _engine
+
+
+def set_engine(engine: str):
+    """Use `engine` for every later read and write in this process."""
+    global _engine
+    if engine not in available_engines():
+        raise ValueError(f"CSV engine {engine!r} is not available; choose from {available_engines()}")
+    _engine = engine
+
+
+@contextmanager
+def using_engine(engine: str):
+    """Use `engine` inside the block, then go back to the previous one."""
+    previous = get_engine()
+    set_engine(engine)
+    try:
+        yield
+    finally:
+        set_engine(previous)
+
+
+def _arrow_options(options: dict, width: int):
+    """Translate C parser options into pyarrow's, or return None if pyarrow cannot follow them."""
+    if not isinstance(options["skiprows"], int) or options.get("header", 0) is not None:
+        return None
+    # pyarrow always drops blank lines
+    if not options.get("skip_blank_lines", True):
+        return None
+
+    names = [str(i) for i in range(width)]
+    positions = options.get("usecols", range(width))
+    dtypes = options["dtype"]
+    column_types = {}
+    for i in positions:
+        dtype = dtypes[i] if isinstance(dtypes, dict) else dtypes
+        column_types[str(i)] = pa.dictionary(pa.int32(), pa.string()) if dtype == "category" else pa.string()
+
+    read_options = pa_csv.ReadOptions(skip_rows=options["skiprows"], column_names=names, block_size=ARROW_BLOCK_BYTES)
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=[str(i) for i in positions], column_types=column_types,
+        null_values=sorted(NA_VALUES), strings_can_be_null=True,
+    )
+    return {"read_options": read_options, "convert_options": convert_options}
+
+
+def _to_frame(table) -> pd.DataFrame:
+    frame = table.to_pandas()
+    frame.columns = [int(name) for name in frame.columns]
+    return frame
+
+
+def _iter_arrow(source, options: dict, arrow_options, chunksize: int):
+    """Yield chunks from pyarrow, finishing with the C parser if it rejects a later row."""
+    start = source.tell()
+    reader = pa_csv.open_csv(source, **arrow_options)
+    rows = 0
+    try:
+        for batch in reader:
+            if batch.num_rows:
+                rows += batch.num_rows
+                yield _to_frame(pa.Table.from_batches([batch]))
+    except pa.ArrowInvalid:
+        source.seek(start)
+        yield from pd.read_csv(source, chunksize=chunksize, **{**options, "skiprows": options["skiprows"] + rows})
+        return
+
+    # Like the C parser, give one empty chunk when there are only blank lines
+    if rows == 0:
+        yield _to_frame(reader.schema.empty_table())
+
+
+def read_body(source, options: dict, width: int, chunksize: int = None):
+    """Run `pd.read_csv(source, chunksize=chunksize, **options)` on the current engine.
+
+    `source` is a path or a binary handle, read from its current position. `width`
+    is the number of columns in the file. Raises EmptyDataError when there
+    are no rows, as the C parser does.
+    """
+    arrow_options = _arrow_options(options, width) if get_engine() == PYARROW else None
+    if arrow_options is None:
+        return pd.read_csv(source, chunksize=chunksize, **options)
+
+    start = source.tell() if hasattr(source, "tell") else 0
+    try:
+        if chunksize is None:
+            return _to_frame(pa_csv.read_csv(source, **arrow_options))
+
+        # Open the reader now, so an empty file raises here as it does with the C parser
+        chunks = _iter_arrow(source, options, arrow_options, chunksize)
+        return _peeked(chunks)
+    except pa.ArrowInvalid as e:
+        if "Empty CSV file" in str(e):
+            raise pd.errors.EmptyDataError("No columns to parse from file") from e
+        if hasattr(source, "seek"):
+            source.seek(start)
+        return pd.read_csv(source, chunksize=chunksize, **options)
+
+
+def _peeked(chunks):
+    """Run a generator up to its first chunk, then return an iterator over all of them."""
+    first = next(chunks)
+    return itertools.chain([first], chunks)
+
+
+def _quoting_rows(table) -> np.ndarray:
+    """Return which rows hold a cell that must be quoted."""
+    needs = np.zeros(table.num_rows, dtype=bool)
+    for column in table.columns:
+        needs |= pc.fill_null(pc.match_substring_regex(column, _NEEDS_QUOTES), False).to_numpy(zero_copy_only=False)
+    return needs
+
+
+def _text_table(frame: pd.DataFrame):
+    """Convert `frame` to an Arrow table of strings, or return None if a column is not text or integers."""
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+
+    columns = []
+    for column in table.columns:
+        kind = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        if not (pa.types.is_string(kind) or pa.types.is_large_string(kind) or pa.types.is_null(kind)
+                or pa.types.is_integer(kind)):
+            return None
+        columns.append(column.cast(pa.string()))
+    return pa.Table.from_arrays(columns, names=[str(i) for i in range(len(columns))])
+
+
+def write_csv(frame: pd.DataFrame, handle, header: bool = True):
+    """Append `frame` to a binary `handle` exactly as `frame.to_csv(handle, index=False)` would."""
+    table = _text_table(frame) if get_engine() == PYARROW and len(frame.columns) > 1 else None
+    if table is None:
+        frame.to_csv(handle, header=header, index=False)
+        return
+
+    if header:
+        frame.head(0).to_csv(handle, index=False)
+    if not len(frame):
+        return
+    options = pa_csv.WriteOptions(include_header=False, quoting_style="none", eol=os.linesep)
+
+    # Runs of rows alternate between pyarrow and pandas, which does the quoting
+    needs = _quoting_rows(table)
+    bounds = [0, *(np.flatnonzero(np.diff(needs)) + 1).tolist(), len(needs)]
+    for start, stop in zip(bounds, bounds[1:]):
+        if needs[start]:
+            frame.iloc[start:stop].to_csv(handle, header=False, index=False)
+        else:
+            handle.flush()
+            pa_csv.write_csv(table.slice(start, stop - start), handle, options)
@@ -0,0 +1,100 @@
+"""Counts of doubtful answers, gathered while an export is cleaned.
+
+    quality = QualityReport()
+    result = run_survey("vce", "export.csv", quality=quality)
+    print(quality.summary())
+
+The decoder already knows, from the selection matrix it builds, how many
+options each row ticked for every field, so the counts cost no extra pass
+over the rows: rows left without an answer (nothing ticked or typed), rows
+where more than one option was ticked and only the first was kept,
+rows dropped for a missing required cell such as the first name, and
+derived columns such as `Record Number` that could not be extracted.
+Chunks of a streamed export are added together.
+"""
+import json
+import os
+
+import numpy as np
+
+
+def quality_path(save_path: str) -> str:
+    """Return where the data-quality report of a cleaned file is written."""
+    return os.path.splitext(save_path)[0] + ".quality.json"
+
+
+def write_quality(save_path: str, report: dict, input_file: str, survey_type: str):
+    """Write a QualityReport.report() as JSON next to the cleaned file."""
+    with open(quality_path(save_path), "w", encoding="utf-8") as handle:
+        json.dump({"input_file": input_file, "survey_type": survey_type, **report}, handle, indent=2)
+
+
+class QualityReport:
+    """Data-quality counts of one export, added up over every chunk cleaned."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_dropped = 0
+        self.required = []
+        self.fields = {}
+        self.extracts = {}
+
+    def add_rows(self, read: int, kept: int, required: list):
+        """Count rows read and those dropped for missing one of the `required` cells."""
+        self.rows_read += read
+        self.rows_dropped += read - kept
+        self.required = list(required)
+
+    def add_field(self, name: str, ticks: np.ndarray, unanswered: np.ndarray):
+        """Count one decoded field from its ticks per row and the rows left with the default answer."""
+        record = self.fields.setdefault(name, {"unanswered": 0, "multiple": 0})
+        record["unanswered"] += int(np.count_nonzero(unanswered))
+        record["multiple"] += int(np.count_nonzero(ticks > 1))
+
+    def add_extract(self, name: str, missing: int):
+        record = self.extracts.setdefault(name, {"missing": 0})
+        record["missing"] += int(missing)
+
+    def add_report(self, report: dict):
+        """Add the counts of another report(), such as one shard of the same export."""
+        self.rows_read += report["rows_read"]
+        self.rows_dropped += report["rows_dropped"]
+        self.required = list(report["required"])
+        for name, record in report["fields"].items():
+            totals = self.fields.setdefault(name, {"unanswered": 0, "multiple": 0})
+            totals["unanswered"] += record["unanswered"]
+            totals["multiple"] += record["multiple"]
+        for name, record in report["extracts"].items():
+            self.extracts.setdefault(name, {"missing": 0})["missing"] += record["missing"]
+
+    def report(self) -> dict:
+        """Return the counts as plain data, ready to be written as JSON."""
+        return {
+            "rows_read": self.rows_read,
+            "rows_kept": self.rows_read - self.rows_dropped,
+            "rows_dropped": self.rows_dropped,
+            "required": self.required,
+            "fields": self.fields,
+            "extracts": self.extracts,
+        }
+
+    def summary(self) -> str:
+        """Return the counts as a table."""
+        return quality_summary(self.report())
+
+
+def quality_summary(report: dict) -> str:
+    """Return a QualityReport.report(), e.g. one kept with a cached result, as a table."""
+    required = ", ".join(report["required"]) or "nothing"
+    lines = [
+        f"rows read: {report['rows_read']}",
+        f"rows dropped for a missing {required}: {report['rows_dropped']}",
+        "",
+        f"{'field':<50} {'no answer':>10} {'several':>10}",
+    ]
+    for name, record in report["fields"].items():
+        lines.append(f"{name:<50.50} {record['unanswered']:>10} {record['multiple']:>10}")
+    if report["extracts"]:
+        lines += ["", f"{'derived column':<50} {'missing':>10}"]
+        lines += [f"{name:<50.50} {record['missing']:>10}" for name, record in report["extracts"].items()]
+    return "\n".join(lines)
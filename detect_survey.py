@@ -0,0 +1,94 @@
+"""Work out which survey an export holds from its question header row alone."""
+import csv
+from itertools import islice
+
+from header_plan import normalize_label
+from schema_files import AUTO, list_schemas, load_schema
+from survey_io import METADATA_ROWS, sniff_header
+from survey_schema import compile_schema
+
+
+class SurveyTypeError(ValueError):
+    """Raised when an export's header does not match the expected survey type."""
+
+
+def read_questions(input_file: str) -> set:
+    """Return the normalized labels of an export's question row.
+
+    Only the metadata rows and the question row are read, with the csv
+    module rather than pandas, so this costs the same for any file size.
+    """
+    with open(input_file, newline="", encoding="utf-8", errors="replace") as handle:
+        rows = list(islice(csv.reader(handle), METADATA_ROWS + 1))
+
+    if len(rows) <= METADATA_ROWS:
+        return set()
+    return {normalize_label(cell) for cell in rows[METADATA_ROWS] if cell.strip()}
+
+
+def match_surveys(questions: set) -> list:
+    """Return every survey type whose schema's signature questions are all present.
+
+    A signature lists questions, as normalized labels, that the survey's
+    cleaner cannot do without.
+    """
+    return [name for name in list_schemas() if set(load_schema(name)["signature"]) <= questions]
+
+
+def _compiles(survey_type: str, plan) -> bool:
+    try:
+        compile_schema(survey_type, plan)
+    except KeyError:
+        return False
+    return True
+
+
+def _most_specific(names: list) -> list:
+    """Drop the surveys whose signature is contained in another one's, e.g. Discovery when VCE also matches."""
+    signatures = {name: set(load_schema(name)["signature"]) for name in names}
+    return [
+        name for name in names
+        if not any(signatures[name] < signatures[other] for other in names if other != name)
+    ]
+
+
+def detect_survey(input_file: str) -> str:
+    """Return the survey type of an export, or raise SurveyTypeError.
+
+    When several signatures match, only surveys whose schema compiles
+    against the header are kept, and of those the most specific signature
+    wins.
+    """
+    matches = match_surveys(read_questions(input_file))
+    if len(matches) > 1:
+        plan = sniff_header(input_file).plan
+        matches = _most_specific([name for name in matches if _compiles(name, plan)])
+    if len(matches) != 1:
+        found = " or ".join(matches) if matches else "no known survey"
+        raise SurveyTypeError(f"Could not tell the survey type of {input_file}: its header matches {found}.")
+    return matches[0]
+
+
+def check_survey_type(survey_type: str, input_file: str):
+    """Raise SurveyTypeError unless `survey_type`'s schema finds every column it needs in the header."""
+    try:
+        compile_schema(survey_type, sniff_header(input_file).plan)
+    except KeyError as e:
+        try:
+            hint = f" It looks like a {detect_survey(input_file)} export; choose that survey instead."
+        except SurveyTypeError:
+            hint = ""
+        raise SurveyTypeError(f"{input_file} is not a {survey_type} export: {e.args[0]}.{hint}") from e
+
+
+def resolve_survey_type(survey_type: str, input_file: str) -> str:
+    """Return the survey type to clean `input_file` with, checking it against the header.
+
+    `survey_type` may be AUTO to detect it from the signatures. A given type
+    is checked by compiling its schema against the header instead, so a
+    file lacking the columns it needs is rejected before the body is parsed.
+    """
+    if survey_type == AUTO:
+        return detect_survey(input_file)
+    check_survey_type(survey_type, input_file)
+    return survey_type
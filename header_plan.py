@@ -0,0 +1,93 @@
+import hashlib
+import json
+from collections import Counter
+
+import pandas as pd
+
+# Common UTF-8 punctuation that has been decoded as cp1252 somewhere upstream
+MOJIBAKE = {
+    "â€™": "'",
+    "â€˜": "'",
+    "â€œ": '"',
+    "â€\x9d": '"',
+    "â€“": "–",
+}
+
+# Number of header layouts kept in memory
+PLAN_CACHE_SIZE = 32
+
+_plan_cache = {}
+
+
+def normalize_label(label: str) -> str:
+    """Return a lookup key for a column label that ignores NBSP, mojibake and spacing."""
+    for broken, fixed in MOJIBAKE.items():
+        label = label.replace(broken, fixed)
+    return " ".join(label.replace("\xa0", " ").split())
+
+
+def create_column_name(header, row_value):
+    """Combine a header cell with the option label underneath it."""
+    if pd.isna(header) or "Unnamed" in str(header) or str(header).strip() == "":
+        return str(row_value)
+    elif pd.notna(row_value) and str(row_value).strip() != "":
+        return f"{header}-{row_value}"
+    else:
+        return header
+
+
+def merge_header_rows(header, sub_header) -> list:
+    """Merge the question row and the option row into one name per column."""
+    header = ["" if "Unnamed" in str(col) else col for col in header]
+    return [create_column_name(col, value) for col, value in zip(header, sub_header)]
+
+
+def make_unique(names) -> list:
+    """Suffix repeated names with their position (e.g. `Other_27`) and strip them."""
+    counts = Counter(names)
+    return [(f"{name}_{i}" if counts[name] > 1 else name).strip() for i, name in enumerate(names)]
+
+
+class HeaderPlan:
+    """Final column names for one header layout, with a lookup index.
+
+    `names` are the physical column names the cleaners work with. The index
+    also maps normalized spellings of each name, so a field written with a
+    plain space still finds a header that uses a non-breaking one.
+    """
+
+    def __init__(self, names: list):
+        self.names = names
+        self.index = {name: name for name in names}
+        for name in names:
+            self.index.setdefault(normalize_label(name), name)
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.index or normalize_label(field) in self.index
+
+    def resolve(self, field: str) -> str:
+        """Return the physical column name for a logical field name."""
+        if field in self.index:
+            return self.index[field]
+        return self.index[normalize_label(field)]
+
+
+def fingerprint(header, sub_header) -> str:
+    """Return a stable hash of the two raw header rows."""
+    rows = [[None if pd.isna(value) else str(value) for value in row] for row in (header, sub_header)]
+    return hashlib.sha1(json.dumps(rows).encode("utf-8")).hexdigest()
+
+
+def get_header_plan(header, sub_header) -> HeaderPlan:
+    """Build the header plan for two raw header rows, reusing it for repeat layouts."""
+    header, sub_header = list(header), list(sub_header)
+    key = fingerprint(header, sub_header)
+
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = HeaderPlan(make_unique(merge_header_rows(header, sub_header)))
+        if len(_plan_cache) >= PLAN_CACHE_SIZE:
+            _plan_cache.pop(next(iter(_plan_cache)))
+        _plan_cache[key] = plan
+
+    return plan
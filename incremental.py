@@ -0,0 +1,181 @@
+"""Clean only the responses a growing export has gained since the last run.
+
+The survey platform re-exports the whole history every time. Next to each
+cleaned file an index (`<output>.index.npz`) keeps the record numbers that
+are already in it, the size and modification time of the export they
+came from and those of the output itself. An output written since by
+anything else, such as a plain clean, no longer matches and is rebuilt. A later run skips an unchanged export straight away. Otherwise
+it reads only the `First Name` column to find unseen record numbers, then
+parses, cleans and appends just those rows.
+
+Rows without a record number cannot be matched between exports. As
+exports only ever grow, such rows count as new when they sit past the end of
+the previous export.
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from csv_engines import read_body, write_csv
+from profiling import NO_PROFILER
+from survey_io import CHUNK_SIZE, iter_survey_chunks, sniff_header
+from survey_schema import load_schema
+from surveys import SURVEYS
+
+# The derived column that identifies a response across exports
+RECORD_FIELD = "Record Number"
+
+INDEX_SUFFIX = ".index.npz"
+
+
+class RecordIndex(NamedTuple):
+    """What an incremental output already holds."""
+
+    survey_type: str
+    record_numbers: np.ndarray  # sorted, unique int64
+    input_rows: int  # body rows in the export last cleaned
+    input_size: int
+    input_mtime_ns: int
+    output_size: int  # the output as the index left it
+    output_mtime_ns: int
+
+
+class IncrementalRun(NamedTuple):
+    """How the rows of one export were handled."""
+
+    new_rows: int  # rows appended to the output
+    known_rows: int  # rows skipped because their record number was indexed
+    unnumbered_rows: int  # rows skipped because they have no record number and are not past the old end
+
+
+def index_path(output_file: str) -> str:
+    return output_file + INDEX_SUFFIX
+
+
+def forget_index(output_file: str):
+    """Delete the index of an output that is being rewritten in full."""
+    try:
+        os.remove(index_path(output_file))
+    except FileNotFoundError:
+        pass
+
+
+def load_index(output_file: str) -> RecordIndex:
+    """Return the index stored next to `output_file`, or None if there is none or it is stale.
+
+    An index is stale when the output has changed since the index was
+    written, as then it cannot be known which records the output holds.
+    """
+    path = index_path(output_file)
+    if not os.path.exists(path) or not os.path.exists(output_file):
+        return None
+    with np.load(path) as stored:
+        if "output_size" not in stored:
+            return None
+        index = RecordIndex(
+            str(stored["survey_type"]), stored["record_numbers"], int(stored["input_rows"]),
+            int(stored["input_size"]), int(stored["input_mtime_ns"]), int(stored["output_size"]),
+            int(stored["output_mtime_ns"]),
+        )
+    stat = os.stat(output_file)
+    if (index.output_size, index.output_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    return index
+
+
+def save_index(output_file: str, index: RecordIndex):
+    """Write the index next to `output_file`, replacing the old one in one step."""
+    temp_path = index_path(output_file) + ".tmp.npz"
+    np.savez_compressed(
+        temp_path, survey_type=index.survey_type, record_numbers=index.record_numbers, input_rows=index.input_rows,
+        input_size=index.input_size, input_mtime_ns=index.input_mtime_ns, output_size=index.output_size,
+        output_mtime_ns=index.output_mtime_ns,
+    )
+    os.replace(temp_path, index_path(output_file))
+
+
+def scan_record_numbers(survey_type: str, input_file: str) -> np.ndarray:
+    """Return the record number of every body row, or -1 where there is none.
+
+    Only the column the record number comes from is converted. Blank lines
+    count as rows without a number, so positions match the row numbers a
+    `keep` mask is skipped by.
+    """
+    source, pattern = load_schema(survey_type)["extract"][RECORD_FIELD]
+    plan, offset = sniff_header(input_file)
+    position = plan.names.index(plan.resolve(source))
+
+    options = {"skiprows": 0, "header": None, "usecols": [position], "dtype": str, "skip_blank_lines": False}
+    with open(input_file, "rb") as handle:
+        handle.seek(offset)
+        try:
+            column = read_body(handle, options, len(plan.names))[position]
+        except pd.errors.EmptyDataError:
+            return np.empty(0, dtype=np.int64)
+
+    numbers = pd.to_numeric(column.str.extract(pattern, expand=False), errors="coerce")
+    return numbers.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def clean_incremental(survey_type: str, input_file: str, output_file: str, chunksize: int = CHUNK_SIZE,
+                      progress=None, profiler=None) -> IncrementalRun:
+    """Append the responses of `input_file` that `output_file` does not have yet.
+
+    The first run, or any run without an index, cleans the whole export into
+    a fresh output. If anything fails part-way the output is cut back to its
+    previous length, so no row is written twice.
+    """
+    profiler = profiler or NO_PROFILER
+    stat = os.stat(input_file)
+    index = load_index(output_file)
+    if index is not None and index.survey_type != survey_type:
+        raise ValueError(f"{output_file} holds {index.survey_type} responses, not {survey_type}")
+
+    # An export that has not changed since the last run has nothing new
+    if index is not None and (index.input_size, index.input_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        return IncrementalRun(0, len(index.record_numbers), 0)
+
+    with profiler.stage("scan record numbers") as run:
+        numbers = scan_record_numbers(survey_type, input_file)
+        run["rows"] = len(numbers)
+
+    known = np.zeros(len(numbers), dtype=bool)
+    unnumbered = np.zeros(len(numbers), dtype=bool)
+    if index is not None:
+        known = np.isin(numbers, index.record_numbers)
+        unnumbered = (numbers < 0) & (np.arange(len(numbers)) < index.input_rows)
+    keep = ~known & ~unnumbered
+
+    seen = index.record_numbers if index is not None else np.empty(0, dtype=np.int64)
+    records = np.union1d(seen, numbers[keep & (numbers >= 0)])
+
+    # Without an index the output is rebuilt, as it cannot be known what it holds
+    appending = index is not None
+    previous_size = os.path.getsize(output_file) if appending else 0
+
+    rows = 0
+    if keep.any() or not appending:
+        survey = SURVEYS[survey_type]
+        try:
+            with open(output_file, "ab" if appending else "wb") as handle:
+                chunks = iter_survey_chunks(input_file, survey.columns, chunksize, progress, profiler, keep)
+                for i, (chunk, plan) in enumerate(chunks):
+                    cleaned = survey.clean_frame(chunk, plan, profiler=profiler)
+                    with profiler.stage("write csv", rows=len(cleaned)):
+                        write_csv(cleaned, handle, header=(i == 0 and previous_size == 0))
+                    rows += len(cleaned)
+        except BaseException:
+            if appending:
+                with open(output_file, "r+b") as handle:
+                    handle.truncate(previous_size)
+            elif os.path.exists(output_file):
+                os.remove(output_file)
+            raise
+
+    output = os.stat(output_file)
+    save_index(output_file, RecordIndex(
+        survey_type, records, len(numbers), stat.st_size, stat.st_mtime_ns, output.st_size, output.st_mtime_ns,
+    ))
+    return IncrementalRun(rows, int(known.sum()), int(unnumbered.sum()))
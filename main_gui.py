@@ -1,40 +1,391 @@
+"""The KIOSC Data Cleaner window.
+
+pandas and the cleaning modules take most of a second to import, longer
+from the packaged .exe, so only Tk and the schema files are loaded before
+the window opens. The cleaning code is imported on a background thread once
+the window is up, or by the first job's worker thread if that comes sooner;
+never on the Tk thread, which would freeze the window until it loaded.
+
+    python main_gui.py --startup-timing [FILE]
+
+prints how long the window took to appear, the background import and the
+first clean, and appends them to FILE (startup_timing.jsonl by default).
+"""
+import time
+
+# Taken before the other imports, so the startup timing counts them too
+STARTED = time.perf_counter()
+
+import argparse
+import importlib
+import json
+import os
+import queue
+import sys
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
+
+from profiling import NO_PROFILER, Profiler
+from schema_files import AUTO, list_schemas, load_schema
+
+# How often the window checks for news from the worker, in milliseconds
+POLL_INTERVAL_MS = 100
+
+STARTUP_TIMING_FILE = "startup_timing.jsonl"
+
+# Imported in the background once the window is up, in the order a clean needs them
+WARM_UP_MODULES = ["detect_survey", "surveys", "output_formats"]
+
+# Messages posted by the worker thread for the Tk loop to apply
+messages = queue.Queue()
+cancel_requested = threading.Event()
+
+# Timings of the current job, when the user asked for a report
+job_profiler = None
+
+# Earlier results, so cleaning the same export again is just a copy; see get_result_cache
+result_cache = None
+result_cache_lock = threading.Lock()
+
+# Where --startup-timing appends its records, or None when not timing
+timing_file = None
+first_clean_timed = False
+
+
+class CleaningCancelled(Exception):
+    """Raised on the worker thread when the user presses Cancel."""
+
+
+def get_result_cache():
+    """Create the result cache on first use, which imports pandas."""
+    global result_cache
+    with result_cache_lock:
+        if result_cache is None:
+            from result_cache import ResultCache
+            result_cache = ResultCache()
+        return result_cache
+
+
+def warm_up():
+    """Import the cleaning code in the background, so the first clean does not wait for it."""
+    start = time.perf_counter()
+    for name in WARM_UP_MODULES:
+        importlib.import_module(name)
+    get_result_cache()
+    report_timing("cleaning code loaded", time.perf_counter() - start)
+
+
+def report_timing(event, seconds):
+    """Print a startup timing and append it to the timing file, when timing is on."""
+    if timing_file is None:
+        return
+    record = {
+        "event": event, "seconds": round(seconds, 4), "since_start": round(time.perf_counter() - STARTED, 4),
+        "frozen": getattr(sys, "frozen", False), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    print(f"{event}: {seconds:.3f}s ({record['since_start']:.3f}s after start)", flush=True)
+    with open(timing_file, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record) + "\n")
+
+
+def on_window_shown(event):
+    """Record when the window first appears, then start loading the cleaning code."""
+    if event.widget is not root:
+        return
+    root.unbind("<Map>")
+    report_timing("window shown", time.perf_counter() - STARTED)
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+def timed_first_clean(task, start):
+    """Wrap the first job's `task` so its time since `start` is reported."""
+    global first_clean_timed
+    if timing_file is None or first_clean_timed:
+        return task
+    first_clean_timed = True
+
+    def run():
+        result = task()
+        report_timing("first clean", time.perf_counter() - start)
+        return result
+
+    return run
+
+
+def report_progress(stage, fraction):
+    """Progress callback that runs on the worker thread."""
+    if cancel_requested.is_set():
+        raise CleaningCancelled()
+    messages.put(("progress", stage, fraction))
+
+
+def run_in_background(task, on_success, saves=False):
+    """Run `task()` on a worker thread and pass its result to `on_success` on the Tk thread.
+
+    `saves` says the task has written the user's file once it returns, so
+    its result is still shown when Cancel came too late to stop it.
+    """
+    def worker():
+        try:
+            result = task()
+        except CleaningCancelled:
+            messages.put(("cancelled",))
+        except Exception as e:
+            messages.put(("error", e))
+        else:
+            messages.put(("done", on_success, result, saves))
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def poll_messages():
+    """Apply the worker's messages to the window, then check again shortly."""
+    try:
+        while True:
+            message = messages.get_nowait()
+            kind = message[0]
+
+            if kind == "progress":
+                _, stage, fraction = message
+                status_label.config(text=f"{stage}...")
+                progress_bar["value"] = fraction * 100
+            elif kind == "done":
+                _, on_success, result, saves = message
+                if cancel_requested.is_set() and not saves:
+                    # The last stage finished before the worker noticed the cancel
+                    finish_job("Cancelled")
+                else:
+                    # A file already saved stays saved, so report it even after a late cancel
+                    on_success(result)
+            elif kind == "cancelled":
+                finish_job("Cancelled")
+            elif kind == "error":
+                finish_job("Failed")
+                messagebox.showerror("Error", f"An error occurred during cleaning:\n{message[1]}")
+    except queue.Empty:
+        pass
+
+    root.after(POLL_INTERVAL_MS, poll_messages)
+
+
+def set_busy(busy):
+    """Disable the survey buttons while a job runs and enable Cancel."""
+    for button in survey_buttons:
+        button.config(state=tk.DISABLED if busy else tk.NORMAL)
+    cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+
+
+def start_job():
+    cancel_requested.clear()
+    set_busy(True)
+    status_label.config(text="Starting...")
+    progress_bar["value"] = 0
+
+
+def finish_job(status):
+    set_busy(False)
+    status_label.config(text=status)
+    progress_bar["value"] = 100 if status == "Done" else 0
 
-from clean_discovery import clean_discovery
-from clean_vce import clean_vce
-from clean_vces import clean_vces
 
+def cancel_job():
+    cancel_requested.set()
+    status_label.config(text="Cancelling...")
 
-def upload_and_clean(cleaning_function):
-    """Handles file upload, cleaning, and saving."""
+
+def ask_save_path():
+    """Ask where to save the cleaned file; its extension picks CSV, Parquet or Feather."""
+    from output_formats import FILE_TYPES
+
+    return filedialog.asksaveasfilename(
+        title="Save Cleaned File As",
+        defaultextension=".csv",
+        filetypes=FILE_TYPES
+    )
+
+
+def profiled(task):
+    """Wrap `task` so the job's profiler (if any) traces it on the worker thread."""
+    if job_profiler is None:
+        return task
+
+    def run():
+        with job_profiler:
+            return task()
+
+    return run
+
+
+def show_report(title, summary):
+    """Show a finished job's report, such as its timings, in its own window."""
+    window = tk.Toplevel(root)
+    window.title(title)
+    text = tk.Text(window, font=("Courier", 10), wrap="none", width=100, height=30)
+    scrollbar = tk.Scrollbar(window, command=text.yview)
+    text.config(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    text.pack(fill="both", expand=True)
+    text.insert("1.0", summary)
+    text.config(state=tk.DISABLED)
+
+
+def upload_and_clean(survey_type):
+    """Handles file upload, then checks and cleans it on worker threads."""
+    global job_profiler
     filepath = filedialog.askopenfilename(
         title="Select a CSV file to clean",
         filetypes=[("CSV Files", "*.csv")]
     )
     if not filepath:
         return
+    start = time.perf_counter()
 
-    try:
-        cleaned_df = cleaning_function(filepath)
+    wants_report = report_wanted.get() or cprofile_wanted.get()
+    job_profiler = Profiler(cprofile=cprofile_wanted.get()) if wants_report else None
+
+    def check():
+        # The cleaning code may still be loading in the background; importing
+        # it here waits for it on this thread instead of freezing the window
+        report_progress("Loading the cleaning code", 0.01)
+        for name in WARM_UP_MODULES:
+            importlib.import_module(name)
+        from detect_survey import SurveyTypeError, resolve_survey_type
+        from survey_io import STREAMING_THRESHOLD_BYTES
+
+        # Check the header before any heavy work, so a wrong choice fails at once
+        try:
+            resolved = resolve_survey_type(survey_type, filepath)
+        except SurveyTypeError as e:
+            return None, False, str(e)
+        return resolved, os.path.getsize(filepath) > STREAMING_THRESHOLD_BYTES, None
+
+    def checked(result):
+        resolved, large, wrong_type = result
+        if wrong_type is not None:
+            finish_job("Wrong survey type")
+            messagebox.showerror("Wrong Survey Type", wrong_type)
+        elif large:
+            clean_to_file(resolved, filepath, start)
+        else:
+            clean_in_memory(resolved, filepath, start)
+
+    start_job()
+    run_in_background(check, checked)
+
+
+def clean_to_file(survey_type, filepath, start):
+    """Clean a large export chunk by chunk straight into the saved file."""
+    save_path = ask_save_path()
+    if not save_path:
+        finish_job("Not saved")
+        return
+
+    def clean():
+        from data_quality import QualityReport, write_quality
+        from output_formats import output_format, stream_clean_to_file
+
+        key = cached_key(survey_type, filepath, output_format(save_path))
+        if get_result_cache().get(key, save_path) is not None:
+            quality = get_result_cache().quality(key)
+        else:
+            collected = QualityReport()
+            rows = stream_clean_to_file(
+                survey_type, filepath, save_path, progress=report_progress, profiler=job_profiler,
+                quality=collected,
+            )
+            quality = collected.report()
+            get_result_cache().put(key, save_path, rows, quality)
+        if quality is not None:
+            write_quality(save_path, quality, filepath, survey_type)
+        return quality
+
+    run_in_background(
+        timed_first_clean(profiled(clean), start), lambda quality: show_saved(save_path, quality), saves=True
+    )
 
-        save_path = filedialog.asksaveasfilename(
-            title="Save Cleaned File As",
-            defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv")]
-        )
-        if not save_path:
-            return
 
-        cleaned_df.to_csv(save_path, index=False)
-        messagebox.showinfo("Success", f"File cleaned successfully!\nSaved to: {save_path}")
-    except Exception as e:
-        messagebox.showerror("Error", f"An error occurred during cleaning:\n{e}")
+def clean_in_memory(survey_type, filepath, start):
+    """Clean an export into a frame, then ask where to save it."""
+    def clean():
+        from surveys import run_survey
 
+        # The save format is not chosen yet, so only a cached CSV is looked for
+        key = cached_key(survey_type, filepath)
+        if get_result_cache().lookup(key) is not None:
+            return survey_type, filepath, key, None, get_result_cache().quality(key)
+        result = run_survey(survey_type, filepath, report_progress, job_profiler)
+        return survey_type, filepath, key, result.frame, result.quality
+
+    run_in_background(timed_first_clean(profiled(clean), start), save_cleaned)
+
+
+def cached_key(survey_type, filepath, fmt="csv"):
+    """Return the result cache key of a file, timed as its own stage."""
+    report_progress("Checking for an earlier clean of this file", 0.02)
+    with (job_profiler or NO_PROFILER).stage("cache lookup"):
+        return get_result_cache().key(survey_type, filepath, fmt)
+
+
+def save_cleaned(result):
+    """Ask for a save path on the Tk thread, then write the file on a worker.
+
+    `result` is the survey type, the raw file, its CSV cache key, the
+    cleaned frame, which is None when a CSV of the file was found in the
+    cache, and the data-quality report, written next to the saved file.
+    """
+    survey_type, filepath, key, cleaned_df, quality = result
+    save_path = ask_save_path()
+    if not save_path:
+        finish_job("Not saved")
+        return
+
+    def save():
+        from data_quality import write_quality
+        from output_formats import output_format, write_cleaned
+        from surveys import run_survey
+
+        report_progress("Saving", 0.95)
+        frame, report = cleaned_df, quality
+        from_cache = frame is None and output_format(save_path) == "csv"
+        if not (from_cache and get_result_cache().get(key, save_path) is not None):
+            if frame is None:
+                # Cached as CSV but wanted in another format, or removed since; clean again
+                cleaned = run_survey(survey_type, filepath, report_progress, job_profiler)
+                frame, report = cleaned.frame, cleaned.quality
+            write_cleaned(survey_type, frame, save_path, job_profiler)
+            if output_format(save_path) == "csv":
+                get_result_cache().put(key, save_path, len(frame), report)
+        if report is not None:
+            write_quality(save_path, report, filepath, survey_type)
+        return report
+
+    run_in_background(save, lambda report: show_saved(save_path, report), saves=True)
+
+
+def show_saved(save_path, quality=None):
+    """Confirm the save, then show the reports asked for."""
+    from data_quality import quality_path, quality_summary
+
+    finish_job("Done")
+    saved = f"File cleaned successfully!\nSaved to: {save_path}"
+    if quality is not None:
+        saved += f"\nData-quality report: {quality_path(save_path)}"
+    messagebox.showinfo("Success", saved)
+    if job_profiler is not None:
+        show_report("Cleaning Timings", job_profiler.summary())
+    if quality is not None and quality_wanted.get():
+        show_report("Data Quality", quality_summary(quality))
+
+
+parser = argparse.ArgumentParser(description="Clean KIOSC survey exports.")
+parser.add_argument("--startup-timing", nargs="?", const=STARTUP_TIMING_FILE, metavar="FILE",
+                    help=f"report startup and first-clean times, appending them to FILE (default {STARTUP_TIMING_FILE})")
+timing_file = parser.parse_known_args()[0].startup_timing
 
 root = tk.Tk()
 root.title("KIOSC Data Cleaner")
-root.geometry("650x500")
+root.geometry("650x720")
 
 # Main frame with transparent background
 main_frame = tk.Frame(root, bg="white", padx=20, pady=20)  # You can set bg to '' if you want transparency
@@ -43,41 +394,50 @@ main_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 title_label = tk.Label(main_frame, text="Select Survey Type to Clean:", font=("Arial", 16), bg="white")
 title_label.pack(pady=10)
 
-btn_vces = tk.Button(
-    main_frame,
-    text="Clean VCES Survey",
-    command=lambda: upload_and_clean(clean_vces),
-    font=("Arial", 12),
-    width=25,
-    height=2,
-)
-btn_vces.pack(pady=5)
-
-btn_discovery = tk.Button(
-    main_frame,
-    text="Clean Discovery Survey",
-    command=lambda: upload_and_clean(clean_discovery),
-    font=("Arial", 12),
-    width=25,
-    height=2,
-)
-btn_discovery.pack(pady=5)
-
-btn_vce = tk.Button(
-    main_frame,
-    text="Clean VCE Survey",
-    command=lambda: upload_and_clean(clean_vce),
-    font=("Arial", 12),
-    width=25,
-    height=2,
-)
-btn_vce.pack(pady=5)
+# One button per survey schema, then one that detects the type from the file
+survey_buttons = []
+for survey_type, text in [*[(name, f"Clean {load_schema(name)['label']} Survey") for name in list_schemas()],
+                          (AUTO, "Detect Survey Type")]:
+    button = tk.Button(
+        main_frame,
+        text=text,
+        command=lambda survey_type=survey_type: upload_and_clean(survey_type),
+        font=("Arial", 12),
+        width=25,
+        height=2,
+    )
+    button.pack(pady=5)
+    survey_buttons.append(button)
+
+progress_bar = ttk.Progressbar(main_frame, orient="horizontal", mode="determinate", length=300)
+progress_bar.pack(pady=(10, 2))
+
+status_label = tk.Label(main_frame, text="Ready", font=("Arial", 10), bg="white")
+status_label.pack()
+
+cancel_button = tk.Button(main_frame, text="Cancel", command=cancel_job, font=("Arial", 10), state=tk.DISABLED)
+cancel_button.pack(pady=5)
+
+report_wanted = tk.BooleanVar(value=False)
+cprofile_wanted = tk.BooleanVar(value=False)
+quality_wanted = tk.BooleanVar(value=True)
+tk.Checkbutton(
+    main_frame, text="Show a data-quality report after cleaning", variable=quality_wanted, font=("Arial", 10),
+    bg="white",
+).pack()
+tk.Checkbutton(
+    main_frame, text="Show a timing report after cleaning", variable=report_wanted, font=("Arial", 10), bg="white"
+).pack()
+tk.Checkbutton(
+    main_frame, text="Include cProfile detail (slower)", variable=cprofile_wanted, font=("Arial", 10), bg="white"
+).pack()
 
 instructions = (
     "Instructions:\n"
-    "1. Choose the correct survey type.\n"
+    "1. Choose the correct survey type, or let the program detect it.\n"
     "2. Select the raw CSV file of the correct survey type you want to clean.\n"
-    "3. The program will automatically process the file. This will be instant.\n"
+    "3. The program will process the file. The bar below the buttons shows\n"
+    "    its progress, and Cancel stops it.\n"
     "4. You will be prompted to save the cleaned file.\n"
     "5. A confirmation message will appear after saving.\n"
 )
@@ -85,4 +445,6 @@ instructions = (
 instruction_label = tk.Label(main_frame, text=instructions, font=("Arial", 11), bg="white", justify="left", anchor="w")
 instruction_label.pack(pady=(10, 5), fill="both")
 
+root.bind("<Map>", on_window_shown)
+root.after(POLL_INTERVAL_MS, poll_messages)
 root.mainloop()
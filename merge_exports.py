@@ -0,0 +1,300 @@
+"""Merge raw or cleaned exports of every survey type into one de-duplicated CSV.
+
+Example:
+    python merge_exports.py --output all_2024.csv "exports/*.csv" "cleaned/*.csv" "cleaned/*.parquet"
+
+Each input is either a raw export, which is cleaned on the way, or a file
+the cleaners wrote as CSV, Parquet or Feather. Rows are cut down to the
+columns every survey's output shares, with a `Survey` column in front, and
+read, de-duplicated and written a chunk at a time, so no file is ever held
+whole. Timestamps read back from Parquet or Feather are written as
+`YYYY-MM-DD HH:MM`, with seconds when there are any.
+
+A response is a duplicate when its survey type and `Record Number` were
+already merged, or, without a record number, when an earlier file of the
+same survey gave an identical row; identical unnumbered rows of one file
+are distinct responses. The first input listed wins.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from batch_clean import expand_inputs
+from csv_engines import read_body, write_csv
+from detect_survey import AUTO, SurveyTypeError, match_surveys, read_questions, resolve_survey_type
+from header_plan import normalize_label
+from output_formats import CSV, output_format
+from profiling import NO_PROFILER
+from survey_io import CHUNK_SIZE, iter_survey_chunks
+from survey_schema import list_schemas, load_schema
+from surveys import SURVEYS
+
+# Column added in front of the shared ones, holding each row's survey type
+SURVEY_COLUMN = "Survey"
+
+RECORD_FIELD = "Record Number"
+
+
+class MergeInput(NamedTuple):
+    """One file to merge and how to read it."""
+
+    path: str
+    survey_type: str
+    raw: bool
+
+
+class MergeResult(NamedTuple):
+    rows: int  # rows written
+    duplicates: int  # rows dropped as already merged
+    files: int
+
+
+def output_columns(survey_type: str) -> list:
+    schema = load_schema(survey_type)
+    return [*schema["output"], *schema.get("passthrough", [])]
+
+
+def shared_columns() -> list:
+    """Return the output columns every survey has, in the order the first survey writes them."""
+    names = list_schemas()
+    common = set.intersection(*({normalize_label(c) for c in output_columns(name)} for name in names))
+    return [column for column in output_columns(names[0]) if normalize_label(column) in common]
+
+
+def _read_header(path: str) -> list:
+    """Return the column names of a cleaned file in any output format."""
+    fmt = output_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if fmt != CSV:
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+
+    with open(path, newline="", encoding="utf-8", errors="replace") as handle:
+        return next(csv.reader(handle), [])
+
+
+def cleaned_survey_types(header: list, path: str) -> list:
+    """Return the survey types whose cleaned output has this header.
+
+    Surveys with the same output columns are told apart by a survey name
+    appearing as a word in the file name, e.g. `vce_term2_cleaned.csv`.
+    """
+    labels = {normalize_label(cell) for cell in header}
+    matches = [name for name in list_schemas() if {normalize_label(c) for c in output_columns(name)} == labels]
+    if len(matches) > 1:
+        words = set(re.split(r"[^a-z0-9]+", os.path.basename(path).lower()))
+        named = [name for name in matches if name in words]
+        matches = named or matches
+    return matches
+
+
+def classify_input(path: str, survey_type: str = AUTO) -> MergeInput:
+    """Tell whether `path` is a raw export or a cleaned file, and of which survey.
+
+    Raises SurveyTypeError when that cannot be told or does not match
+    `survey_type`.
+    """
+    if output_format(path) == CSV and match_surveys(read_questions(path)):
+        return MergeInput(path, resolve_survey_type(survey_type, path), True)
+
+    matches = cleaned_survey_types(_read_header(path), path)
+    if survey_type != AUTO:
+        if survey_type not in matches:
+            raise SurveyTypeError(f"{path} is not a raw or cleaned {survey_type} file")
+        matches = [survey_type]
+    if len(matches) != 1:
+        found = " or ".join(matches) if matches else "no known survey"
+        raise SurveyTypeError(
+            f"Could not tell the survey type of {path}: it looks like a cleaned file of {found}. "
+            "Put the survey name in its file name or pass --type."
+        )
+    return MergeInput(path, matches[0], False)
+
+
+def iter_input_chunks(merge_input: MergeInput, chunksize: int = CHUNK_SIZE, profiler=None):
+    """Yield the cleaned rows of one input a chunk at a time."""
+    if merge_input.raw:
+        survey = SURVEYS[merge_input.survey_type]
+        for chunk, plan in iter_survey_chunks(merge_input.path, survey.columns, chunksize, profiler=profiler):
+            yield survey.clean_frame(chunk, plan, profiler=profiler)
+        return
+
+    fmt = output_format(merge_input.path)
+    if fmt != CSV:
+        yield from _iter_columnar_chunks(merge_input.path, fmt, chunksize)
+        return
+
+    header = _read_header(merge_input.path)
+    options = {"skiprows": 1, "header": None, "dtype": str}
+    with open(merge_input.path, "rb") as handle:
+        try:
+            chunks = read_body(handle, options, len(header), chunksize)
+        except pd.errors.EmptyDataError:
+            return
+        for chunk in chunks:
+            chunk.columns = header[:len(chunk.columns)]
+            yield chunk
+
+
+def _iter_columnar_chunks(path: str, fmt: str, chunksize: int):
+    """Yield a cleaned Parquet or Feather file a chunk of rows at a time."""
+    import pyarrow as pa
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunksize):
+                yield batch.slice(start, chunksize).to_pandas()
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Return a column as the text a cleaned CSV holds, missing cells left missing."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        with_seconds = bool((values.dt.second != 0).any())
+        return values.dt.strftime("%Y-%m-%d %H:%M:%S" if with_seconds else "%Y-%m-%d %H:%M")
+    return values.astype(str).where(values.notna())
+
+
+def align(frame: pd.DataFrame, survey_type: str, columns: list) -> pd.DataFrame:
+    """Return the shared `columns` of a cleaned frame as text, with the survey type in front.
+
+    Empty cells become missing, as both are written as nothing, so a row
+    hashes the same whether it was cleaned now or read back from a file.
+    """
+    by_label = {normalize_label(name): name for name in frame.columns}
+    aligned = {SURVEY_COLUMN: pd.Series(survey_type, index=frame.index, dtype=str)}
+    for column in columns:
+        source = by_label.get(normalize_label(column))
+        if source is None:
+            aligned[column] = pd.Series(np.nan, index=frame.index, dtype=str)
+            continue
+        values = _as_text(frame[source])
+        aligned[column] = values.mask(values == "")
+    return pd.DataFrame(aligned, index=frame.index)
+
+
+class SeenRows:
+    """The responses merged so far, per survey type, in hashed sets so each chunk costs only its own rows."""
+
+    def __init__(self):
+        self.records = {}  # survey type -> set of record numbers merged
+        self.hashes = {}  # survey type -> set of hashes of unnumbered rows from earlier files
+        self._file_hashes = {}  # survey type -> hashes of unnumbered rows of the current file
+
+    def new_rows(self, frame: pd.DataFrame) -> np.ndarray:
+        """Mark the rows of an aligned frame not merged before, and remember them."""
+        if not len(frame):
+            return np.zeros(0, dtype=bool)
+        survey_type = frame[SURVEY_COLUMN].iat[0]
+
+        numbers = pd.to_numeric(frame[RECORD_FIELD], errors="coerce")
+        numbered = numbers.notna().to_numpy()
+        keys = numbers.fillna(-1).to_numpy(dtype=np.int64)
+
+        # A record number counts once, whichever file or chunk it came in
+        records = self.records.setdefault(survey_type, set())
+        keep = numbered & ~pd.Series(keys).duplicated().to_numpy() & ~_in_set(keys, records)
+        records.update(keys[keep].tolist())
+
+        # An unnumbered row is only checked against the files merged before this one
+        unnumbered = ~numbered
+        if unnumbered.any():
+            row_hashes = pd.util.hash_pandas_object(frame[unnumbered], index=False).to_numpy()
+            fresh = ~_in_set(row_hashes, self.hashes.get(survey_type, set()))
+            keep[unnumbered] = fresh
+            self._file_hashes.setdefault(survey_type, []).append(row_hashes[fresh])
+        return keep
+
+    def end_file(self):
+        """Let the unnumbered rows of the file just merged count against later files."""
+        for survey_type, row_hashes in self._file_hashes.items():
+            hashes = self.hashes.setdefault(survey_type, set())
+            for chunk_hashes in row_hashes:
+                hashes.update(chunk_hashes.tolist())
+        self._file_hashes = {}
+
+
+def _in_set(keys: np.ndarray, seen: set) -> np.ndarray:
+    """Mark the keys already in `seen`, one hashed lookup each."""
+    return np.fromiter((key in seen for key in keys.tolist()), dtype=bool, count=len(keys))
+
+
+def merge_exports(input_files: list, output_file: str, survey_type: str = AUTO, chunksize: int = CHUNK_SIZE,
+                  progress=None, profiler=None) -> MergeResult:
+    """Merge `input_files` into `output_file` and return what was written.
+
+    Every input is classified before anything is written, so a file of an
+    unknown layout fails the merge up front. If merging stops part-way the
+    partial output is removed.
+    """
+    profiler = profiler or NO_PROFILER
+    inputs = [classify_input(path, survey_type) for path in input_files]
+    columns = shared_columns()
+
+    seen = SeenRows()
+    rows = duplicates = 0
+    try:
+        with open(output_file, "wb") as handle:
+            write_csv(pd.DataFrame(columns=[SURVEY_COLUMN, *columns]), handle)
+            for n, merge_input in enumerate(inputs):
+                for chunk in iter_input_chunks(merge_input, chunksize, profiler):
+                    with profiler.stage("de-duplicate", rows=len(chunk)):
+                        aligned = align(chunk, merge_input.survey_type, columns)
+                        keep = seen.new_rows(aligned)
+                    with profiler.stage("write csv", rows=int(keep.sum())):
+                        write_csv(aligned[keep], handle, header=False)
+                    rows += int(keep.sum())
+                    duplicates += int((~keep).sum())
+                seen.end_file()
+                if progress:
+                    progress(f"Merged {merge_input.path}", (n + 1) / len(inputs))
+    except BaseException:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+    return MergeResult(rows, duplicates, len(inputs))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Merge raw or cleaned KIOSC survey exports into one CSV.")
+    parser.add_argument("inputs", nargs="+",
+                        help="raw or cleaned CSV, Parquet or Feather files, or glob patterns; "
+                             "earlier files win on duplicates")
+    parser.add_argument("--output", "-o", required=True, help="CSV file the merged responses are written to")
+    parser.add_argument("--type", "-t", default=AUTO, choices=[AUTO, *sorted(SURVEYS)],
+                        help="survey type of every input (default: detect each file's type)")
+    args = parser.parse_args(argv)
+
+    # Keep the order given, as it decides which copy of a duplicate is kept
+    input_files = list(dict.fromkeys(path for pattern in args.inputs for path in expand_inputs([pattern])))
+    if not input_files:
+        parser.error("no input files matched")
+
+    try:
+        result = merge_exports(input_files, args.output, args.type)
+    except SurveyTypeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"{result.rows} responses from {result.files} files written to {args.output}, "
+          f"{result.duplicates} duplicates dropped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
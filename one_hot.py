@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+def selection_matrix(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Return a rows x columns boolean array marking the ticked one-hot cells."""
+    frame = df[columns]
+
+    # Columns loaded as compact flags need no string comparison at all
+    flags = (frame.dtypes == bool).to_numpy()
+    if flags.all():
+        return frame.to_numpy(dtype=bool)
+
+    values = frame.to_numpy(dtype=object)
+    selected = values == '1'
+
+    # Tolerate padded answers such as ' 1' without stripping every cell
+    padded = ~selected & pd.notna(values)
+    padded[:, flags] = False
+    if padded.any():
+        selected[padded] = np.char.strip(values[padded].astype(str)) == '1'
+
+    if flags.any():
+        selected[:, flags] = frame.iloc[:, flags].to_numpy(dtype=bool)
+
+    return selected
+
+
+def first_selected(selected: np.ndarray, labels: list, default='Unknown') -> np.ndarray:
+    """Pick the label of the first ticked option in each row of `selected`.
+
+    A label is either a constant or an array aligned with the rows, which lets
+    options such as 'Other' return the respondent's comment instead.
+    """
+    result = np.full(selected.shape[0], default, dtype=object)
+    if not labels:
+        return result
+
+    first = selected.argmax(axis=1)
+    answered = selected.any(axis=1)
+
+    for i, label in enumerate(labels):
+        rows = answered & (first == i)
+        if isinstance(label, (pd.Series, np.ndarray)):
+            result[rows] = np.asarray(label, dtype=object)[rows]
+        else:
+            result[rows] = label
+
+    return result
+
+
+def grouped_selection(selected: np.ndarray, groups: tuple) -> np.ndarray:
+    """OR the columns of each group of positions together in one pass; an empty group is never ticked."""
+    filled = [group for group in groups if group]
+    ticked = np.zeros((len(selected), len(groups)), dtype=bool)
+    if filled:
+        starts = np.cumsum([0, *[len(group) for group in filled[:-1]]])
+        columns = [position for group in filled for position in group]
+        ticked[:, [i for i, group in enumerate(groups) if group]] = np.logical_or.reduceat(
+            selected[:, columns], starts, axis=1
+        )
+    return ticked
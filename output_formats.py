@@ -0,0 +1,103 @@
+"""Save cleaned tables as CSV, Parquet or Feather.
+
+The format follows the file extension and CSV stays the default. Parquet
+and Feather files are typed so they reload without any parsing: the
+extracted columns (`Record Number`) become nullable integers, the copied
+ones (`Timestamp`) datetimes, numeric columns such as Likert scores stay
+numbers and every other column, the decoded fields and rating answers, is a
+dictionary-encoded categorical. A column keeps its text
+when any of its values would not convert. Both formats need pyarrow.
+"""
+import os
+
+import pandas as pd
+
+from csv_engines import write_csv
+from profiling import NO_PROFILER
+from survey_io import CHUNK_SIZE, iter_survey_chunks, stream_clean
+from survey_schema import load_schema
+from surveys import SURVEYS
+
+CSV = "csv"
+
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# For the save dialog, CSV first as it is the default
+FILE_TYPES = [("CSV Files", "*.csv"), ("Parquet Files", "*.parquet"), ("Feather Files", "*.feather")]
+
+# Tried in turn on copied timestamps; ISO first, so 2024-03-04 is never read day first
+_DATE_FORMATS = [{"format": "ISO8601"}, {"format": "mixed", "dayfirst": True}]
+
+
+def output_format(path: str) -> str:
+    """Return the format a file is saved in, from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    return next((fmt for fmt, ext in EXTENSIONS.items() if ext == extension), CSV)
+
+
+def _as_numbers(text: pd.Series, present: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(text.where(present), errors="coerce")
+    if (numbers.isna() & present).any():
+        return text
+    return numbers.astype("Int64")
+
+
+def _as_datetimes(text: pd.Series, present: pd.Series) -> pd.Series:
+    for options in _DATE_FORMATS:
+        parsed = pd.to_datetime(text.where(present), errors="coerce", **options)
+        if not (parsed.isna() & present).any():
+            return parsed
+    return text
+
+
+def typed_frame(survey_type: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """Return `frame` with the column types a columnar file stores."""
+    schema = load_schema(survey_type)
+    typed = {}
+    for column in frame.columns:
+        values = frame[column]
+        if column in schema.get("extract", {}) or column in schema.get("copy", {}):
+            text = values.astype("string")
+            present = text.notna() & (text != "")
+            convert = _as_numbers if column in schema.get("extract", {}) else _as_datetimes
+            typed[column] = convert(text, present)
+        elif pd.api.types.is_numeric_dtype(values):
+            typed[column] = values
+        else:
+            typed[column] = values.astype("category")
+    return pd.DataFrame(typed, index=frame.index)
+
+
+def write_cleaned(survey_type: str, frame: pd.DataFrame, save_path: str, profiler=None):
+    """Save a cleaned frame in the format its path's extension names."""
+    fmt = output_format(save_path)
+    with (profiler or NO_PROFILER).stage(f"write {fmt}", rows=len(frame)):
+        if fmt == CSV:
+            with open(save_path, "wb") as handle:
+                write_csv(frame, handle)
+        elif fmt == "parquet":
+            typed_frame(survey_type, frame).to_parquet(save_path, index=False)
+        else:
+            typed_frame(survey_type, frame).reset_index(drop=True).to_feather(save_path)
+
+
+def stream_clean_to_file(survey_type: str, input_file: str, save_path: str, chunksize: int = CHUNK_SIZE,
+                         progress=None, profiler=None, quality=None) -> int:
+    """Clean a large export chunk by chunk into `save_path` and return the rows written.
+
+    CSV is appended chunk by chunk. A columnar file is written once from the
+    cleaned chunks, which are a small fraction of the raw export.
+    """
+    survey = SURVEYS[survey_type]
+    if output_format(save_path) == CSV:
+        return stream_clean(
+            survey.clean_frame, input_file, save_path, survey.columns, chunksize, progress, profiler, quality
+        )
+
+    cleaned = [
+        survey.clean_frame(chunk, plan, profiler=profiler, quality=quality)
+        for chunk, plan in iter_survey_chunks(input_file, survey.columns, chunksize, progress, profiler)
+    ]
+    frame = pd.concat(cleaned, ignore_index=True)
+    write_cleaned(survey_type, frame, save_path, profiler)
+    return len(frame)
@@ -0,0 +1,131 @@
+"""Per-stage timing of the cleaning pipeline.
+
+    profiler = Profiler(cprofile=True)
+    with profiler:
+        result = run_survey("vce", "export.csv", profiler=profiler)
+    print(profiler.summary())
+
+Each stage records its wall time, the rows it handled and how much traced
+memory it left allocated. Stages with the same name, such as one per chunk
+in streaming mode, are added together.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Functions listed in the optional cProfile capture
+PROFILE_LINES = 30
+
+
+class Profiler:
+    """Collects stage timings, with optional memory tracing and a cProfile capture."""
+
+    def __init__(self, memory: bool = True, cprofile: bool = False):
+        self.memory = memory
+        self.cprofile = cprofile
+        self.stages = {}
+        self.peak_bytes = None
+        self.profile_text = None
+        self._depth = 0
+        self._profile = None
+        self._owns_tracing = False
+
+    def start(self):
+        """Begin memory tracing and cProfile capture on the calling thread."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        """End what `start` began and keep the peak memory and profile text."""
+        if self._profile is not None:
+            self._profile.disable()
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            self.profile_text = text.getvalue()
+            self._profile = None
+        if tracemalloc.is_tracing():
+            self.peak_bytes = max(self.peak_bytes or 0, tracemalloc.get_traced_memory()[1])
+            if self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        """Time the enclosed block as stage `name`.
+
+        Yields a dict whose "rows" entry can be set once the row count is
+        known, e.g. after a read.
+        """
+        record = self.stages.setdefault(name, {
+            "stage": name, "depth": self._depth, "calls": 0, "seconds": 0.0, "rows": 0,
+            "memory_delta_bytes": 0 if self.memory else None,
+        })
+        run = {"rows": rows}
+        tracing = self.memory and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield run
+        finally:
+            self._depth -= 1
+            record["calls"] += 1
+            record["seconds"] += time.perf_counter() - start
+            record["rows"] += run["rows"] or 0
+            if tracing and tracemalloc.is_tracing():
+                record["memory_delta_bytes"] += tracemalloc.get_traced_memory()[0] - before
+
+    def report(self) -> dict:
+        """Return the timings as plain data, ready to be written as JSON."""
+        stages = [
+            {**record, "rows_per_sec": record["rows"] / record["seconds"] if record["seconds"] else None}
+            for record in self.stages.values()
+        ]
+        return {
+            "seconds": sum(record["seconds"] for record in stages if record["depth"] == 0),
+            "peak_bytes": self.peak_bytes,
+            "stages": stages,
+            "profile": self.profile_text,
+        }
+
+    def summary(self) -> str:
+        """Return the timings as a table, followed by the cProfile capture if taken."""
+        report = self.report()
+        lines = [f"{'stage':<40} {'seconds':>9} {'rows':>9} {'memory MB':>10}"]
+        for record in report["stages"]:
+            memory = record["memory_delta_bytes"]
+            lines.append(
+                f"{'  ' * record['depth'] + record['stage']:<40.40} {record['seconds']:>9.3f} {record['rows']:>9} "
+                f"{'' if memory is None else f'{memory / 1e6:+.1f}':>10}"
+            )
+        lines.append(f"{'total':<40} {report['seconds']:>9.3f}")
+        if report["peak_bytes"] is not None:
+            lines.append(f"peak traced memory: {report['peak_bytes'] / 1e6:.1f} MB")
+        if report["profile"]:
+            lines += ["", report["profile"]]
+        return "\n".join(lines)
+
+
+class _NoProfiler:
+    """Stand-in used when no profiler is given, so stages cost next to nothing."""
+
+    def stage(self, name: str, rows: int = None):
+        return nullcontext({"rows": rows})
+
+
+NO_PROFILER = _NoProfiler()
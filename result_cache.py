@@ -0,0 +1,189 @@
+"""On-disk cache of cleaned files, so re-cleaning the same export is a copy.
+
+Entries are keyed by the SHA-256 of the raw export, the survey type and a
+version of the cleaning logic. The version hashes the survey's schema, the
+cleaning modules and the pandas and pyarrow versions, so any change to how
+a survey is cleaned misses the old entries, which then age out. The cache
+keeps to a size cap by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from csv_engines import pa
+from school_registry import load_schools
+from survey_schema import load_schema
+
+# Where entries live unless KIOSC_CACHE_DIR says otherwise
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"), "KIOSC_Data_Cleaner"
+)
+
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+# Modules whose code decides what a cleaned file contains
+CLEANING_MODULES = [
+    "canonical_names", "csv_engines", "data_quality", "header_plan", "one_hot", "output_formats", "school_registry",
+    "survey_io", "survey_schema",
+]
+
+# Bump when the layout of the cache itself changes
+CACHE_FORMAT = 2
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cleaner_version(survey_type: str) -> str:
+    """Return a hash that changes whenever the cleaning of `survey_type` could."""
+    # pyarrow parses and writes the files too, so a new one may change them
+    pyarrow_version = pa.__version__ if pa is not None else "none"
+    digest = hashlib.sha256(f"{CACHE_FORMAT}:{pd.__version__}:{pyarrow_version}".encode())
+    digest.update(json.dumps(load_schema(survey_type), sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps(load_schools()).encode("utf-8"))
+
+    for name in CLEANING_MODULES:
+        __import__(name)
+        path = getattr(sys.modules[name], "__file__", None)
+        if path and os.path.exists(path):
+            with open(path, "rb") as handle:
+                digest.update(handle.read())
+
+    # A frozen .exe has no sources to read, so a new build starts a new cache
+    if getattr(sys, "frozen", False):
+        stat = os.stat(sys.executable)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+
+
+class ResultCache:
+    """A folder of cleaned files, each with a small JSON record of its rows and data quality."""
+
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or os.environ.get("KIOSC_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._versions = {}
+
+    def key(self, survey_type: str, input_file: str, output_format: str = "csv") -> str:
+        """Return the cache key of cleaning `input_file` as `survey_type` into `output_format`."""
+        if survey_type not in self._versions:
+            self._versions[survey_type] = cleaner_version(survey_type)
+        return hashlib.sha256(
+            f"{file_digest(input_file)}:{survey_type}:{output_format}:{self._versions[survey_type]}".encode()
+        ).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        return os.path.join(self.directory, f"{key}.data"), os.path.join(self.directory, f"{key}.json")
+
+    def lookup(self, key: str) -> int:
+        """Return the row count of a cached result and mark it as used, or None on a miss."""
+        data_path, info_path = self._paths(key)
+        try:
+            with open(info_path, encoding="utf-8") as handle:
+                rows = json.load(handle)["rows"]
+            os.utime(data_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return rows
+
+    def quality(self, key: str) -> dict:
+        """Return the data-quality report stored with a cached result, or None."""
+        try:
+            with open(self._paths(key)[1], encoding="utf-8") as handle:
+                return json.load(handle).get("quality")
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key: str, save_path: str) -> int:
+        """Copy a cached result to `save_path` and return its row count, or None on a miss."""
+        rows = self.lookup(key)
+        if rows is None:
+            return None
+        try:
+            shutil.copyfile(self._paths(key)[0], save_path)
+        except FileNotFoundError:
+            return None
+        return rows
+
+    def put(self, key: str, cleaned_file: str, rows: int, quality: dict = None):
+        """Store a copy of a cleaned file and its QualityReport.report(), then evict old entries over the size cap.
+
+        The cache is only an accelerator, so failing to write it is ignored.
+        """
+        try:
+            if os.path.getsize(cleaned_file) > self.max_bytes:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            data_path, info_path = self._paths(key)
+
+            # Write under temporary names, the data before the record a lookup
+            # reads, so a reader never sees a record without its data
+            self._write_atomic(data_path, lambda temp_path: shutil.copyfile(cleaned_file, temp_path))
+            self._write_atomic(info_path, lambda temp_path: _write_json(temp_path, {"rows": rows, "quality": quality}))
+
+            self.evict()
+        except OSError:
+            pass
+
+    def _write_atomic(self, path: str, write):
+        """Call `write` on a temporary file in the cache, then move it to `path`, or remove it on failure."""
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(handle)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits its cap."""
+        entries = []
+        for name in os.listdir(self.directory):
+            # Anything but a row record or an entry still being written is data,
+            # including files of older cache formats
+            if not name.endswith((".json", ".tmp")):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, os.path.splitext(path)[0] + ".json"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,27 @@
+"""Find and read the survey schema files without loading pandas.
+
+Kept apart from survey_schema so the GUI can list the surveys, and label
+its buttons, before the cleaning code is imported.
+"""
+import json
+import os
+import sys
+from functools import lru_cache
+
+# Schemas sit next to the code, or inside the bundle when run as an .exe
+SCHEMA_DIR = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "schemas")
+
+# Passed instead of a survey type to have it detected from the file
+AUTO = "auto"
+
+
+def list_schemas() -> list:
+    """Return the name of every schema, which is also its survey type."""
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(SCHEMA_DIR) if name.endswith(".json"))
+
+
+@lru_cache(maxsize=None)
+def load_schema(name: str) -> dict:
+    """Read a schema file once. The returned dict must not be modified."""
+    with open(os.path.join(SCHEMA_DIR, f"{name}.json"), encoding="utf-8") as handle:
+        return json.load(handle)
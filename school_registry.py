@@ -0,0 +1,100 @@
+"""The schools respondents pick from, shared by every survey.
+
+`schemas/registries/schools.json` lists each school once, by its canonical
+name, in the order that decides which school wins when a respondent ticks
+more than one, unless a survey's registry option keeps its own order (see
+school_options). An export's columns are matched to it once per header: a
+column is a school when its name without the `_NNN` suffix, or the option
+after a question (`What school are you from?-Bayswater Secondary College`),
+is a registry name, ignoring case, NBSP and spacing. Every column of the
+same school, such as `Boronia K-12 College_69` and `_88`, becomes one option.
+"""
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+
+from header_plan import PLAN_CACHE_SIZE, normalize_label
+
+# How a registry option orders the schools it finds
+REGISTRY_ORDER = "registry"
+HEADER_ORDER = "header"
+
+# Kept with the schemas, so it is bundled with them into the .exe
+REGISTRY_FILE = os.path.join(
+    getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "schemas", "registries", "schools.json"
+)
+
+
+def school_key(label: str) -> str:
+    """Return the lookup key of a school label."""
+    return normalize_label(label).casefold()
+
+
+@lru_cache(maxsize=None)
+def load_schools() -> tuple:
+    """Return the canonical school names in priority order."""
+    with open(REGISTRY_FILE, encoding="utf-8") as handle:
+        return tuple(json.load(handle)["schools"])
+
+
+@lru_cache(maxsize=None)
+def _index() -> dict:
+    return {school_key(school): school for school in load_schools()}
+
+
+def canonical_school(column: str) -> str:
+    """Return the registry school a header column stands for, or None."""
+    index = _index()
+    name = re.sub(r"_\d+$", "", column)
+    found = index.get(school_key(name))
+    if found is None and "-" in name:
+        # A question's first option carries the question text in front
+        found = index.get(school_key(name.split("-", 1)[1])) or index.get(school_key(name.rsplit("-", 1)[1]))
+    return found
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def school_options(names: tuple, containing: tuple = (), only: tuple = (), exclude: tuple = (),
+                   order=REGISTRY_ORDER) -> list:
+    """Return (columns, school) options for one header, by default in registry order.
+
+    With `containing` words, only the columns containing one of them are
+    looked at, and those that are not registry schools follow as options
+    of their own, named by the column without its suffix. `only` and `exclude` keep, or leave out,
+    the schools named, so a survey can rank some of them around its other
+    options. `order` is REGISTRY_ORDER, HEADER_ORDER (each school at its
+    first column in the header, unlisted columns among them) or a tuple of
+    column names ranked first, each an option of its own, as a survey that
+    checks its columns in a set order needs; other schools follow in
+    registry order.
+    """
+    columns = {}
+    in_header = []
+    for name in names:
+        if containing and not any(word in name for word in containing):
+            continue
+        school = canonical_school(name)
+        if school is not None:
+            if (only and school not in only) or school in exclude:
+                continue
+            if school not in columns:
+                in_header.append(school)
+            columns.setdefault(school, []).append(name)
+        elif containing:
+            in_header.append(([name], name.rsplit("_", 1)[0]))
+
+    if order == HEADER_ORDER:
+        return [(columns[entry], entry) if isinstance(entry, str) else entry for entry in in_header]
+
+    options = []
+    if order != REGISTRY_ORDER:
+        ranked = set(order)
+        for name in order:
+            school = canonical_school(name)
+            if name in names and school in columns:
+                options.append(([name], school))
+        columns = {school: [name for name in group if name not in ranked] for school, group in columns.items()}
+    options.extend((columns[school], school) for school in load_schools() if columns.get(school))
+    return options + [entry for entry in in_header if not isinstance(entry, str)]
@@ -0,0 +1,373 @@
+import csv
+import io
+import mmap
+import os
+import sys
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from csv_engines import NA_VALUES, read_body, write_csv
+from header_plan import HeaderPlan, get_header_plan
+from profiling import NO_PROFILER
+
+# Number of metadata rows above the two header rows in every export
+METADATA_ROWS = 4
+
+# Rows read, cleaned and written at a time in streaming mode
+CHUNK_SIZE = 10_000
+
+# Exports larger than this are cleaned in streaming mode by the GUI
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+# How a column is held in memory once loaded
+FLAG = "flag"  # one-hot answer indicator, stored as a boolean array
+CATEGORY = "category"  # repeated answer text, stored as a categorical
+TEXT = "text"  # free text that is mostly unique per row
+
+_PARSE_DTYPES = {FLAG: "category", CATEGORY: "category", TEXT: str}
+
+# Size of an empty cell when every value is a Python object
+_NAN_BYTES = sys.getsizeof(float("nan"))
+
+
+def load_spec(flags=(), categories=(), text=()) -> dict:
+    """Build a {column: kind} mapping, letting later kinds override earlier ones."""
+    return {**dict.fromkeys(flags, FLAG), **dict.fromkeys(categories, CATEGORY), **dict.fromkeys(text, TEXT)}
+
+
+class SniffedHeader(NamedTuple):
+    """The header plan of an export and where its body starts."""
+
+    plan: HeaderPlan
+    body_offset: int  # byte position of the first body row
+
+
+def _read_record(handle) -> bytes:
+    """Read one CSV record from a binary handle as raw bytes, following quoted line breaks."""
+    record = b""
+    while True:
+        line = handle.readline()
+        record += line
+        # An odd number of quotes means a quoted cell runs on to the next line
+        if not line or record.count(b'"') % 2 == 0:
+            return record
+
+
+def _parse_record(record: bytes) -> list:
+    return next(csv.reader(io.StringIO(record.decode("utf-8"))), [])
+
+
+def _header_names(cells: list) -> list:
+    """Name the question row the way `pd.read_csv` does: blanks become `Unnamed: i`, repeats `name.1`.
+
+    As in pandas, a suffix is skipped when another column already has that name.
+    """
+    names = [cell if cell != "" else f"Unnamed: {i}" for i, cell in enumerate(cells)]
+    original = set(names)
+    counts = defaultdict(int)
+    for i, name in enumerate(names):
+        base, count = name, counts[name]
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in original else counts[name]
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+
+def sniff_header(input_file: str) -> SniffedHeader:
+    """Read the metadata and two header rows of an export with a small buffered read.
+
+    The names match what `pd.read_csv(skiprows=METADATA_ROWS, nrows=1,
+    dtype=str)` gives for the same rows, so every plan and schema column is
+    unchanged, while the body is left untouched for a single parse from
+    `body_offset`.
+    """
+    with open(input_file, "rb") as handle:
+        for _ in range(METADATA_ROWS):
+            if not _read_record(handle):
+                break
+
+        # Like pandas, skip blank lines before each header row
+        rows = []
+        while len(rows) < 2:
+            record = _read_record(handle)
+            if not record:
+                break
+            if record.strip(b"\r\n"):
+                rows.append(_parse_record(record))
+
+        # Start the body at its first row; a leading blank line would set the width of a headerless parse
+        offset = handle.tell()
+        while _read_record(handle).strip(b"\r\n") == b"" and handle.tell() > offset:
+            offset = handle.tell()
+
+    if not rows:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+    header = _header_names(rows[0])
+    options = rows[1] if len(rows) > 1 else []
+    options = [np.nan if cell in NA_VALUES else cell for cell in options[:len(header)]]
+    options += [np.nan] * (len(header) - len(options))
+
+    # Combine the two header rows into unique column names
+    return SniffedHeader(get_header_plan(header, options), offset)
+
+
+def _body_options(plan: HeaderPlan, columns, keep=None) -> dict:
+    """Return read_csv arguments that parse only the body rows a cleaner needs.
+
+    The source is read from the start of the body, see sniff_header. `keep`
+    is an optional boolean array over the body rows, counting blank lines as
+    the tokenizer does; rows where it is False are skipped by the tokenizer
+    and never converted.
+    """
+    options = {"skiprows": 0, "header": None}
+    if keep is not None:
+        options["skiprows"] = set(np.flatnonzero(~np.asarray(keep)).tolist())
+    if columns is None:
+        options["dtype"] = str
+        return options
+
+    spec = columns(plan)
+    positions = [i for i, name in enumerate(plan.names) if name in spec]
+    options["usecols"] = positions
+    options["dtype"] = {i: _PARSE_DTYPES[spec[plan.names[i]]] for i in positions}
+    return options
+
+
+def _read_body(source, plan: HeaderPlan, columns, chunksize=None, keep=None):
+    """Parse the body rows of a binary handle at the start of the body, treating no responses as empty."""
+    options = _body_options(plan, columns, keep)
+    try:
+        return read_body(source, options, len(plan.names), chunksize)
+    except pd.errors.EmptyDataError:
+        positions = options.get("usecols", range(len(plan.names)))
+        dtypes = options["dtype"]
+        empty = pd.DataFrame({
+            i: pd.Series(dtype=dtypes[i] if isinstance(dtypes, dict) else dtypes) for i in positions
+        })
+        return empty if chunksize is None else iter([empty])
+
+
+def _to_flags(column: pd.Series) -> np.ndarray:
+    """Turn a categorical one-hot column into a boolean array of ticked cells."""
+    ticked = [str(value).strip() == "1" for value in column.cat.categories]
+
+    # Missing cells have code -1, which picks the trailing False
+    lookup = np.array(ticked + [False])
+    return lookup[column.cat.codes.to_numpy()]
+
+
+def _object_bytes(column: pd.Series) -> int:
+    """Estimate a column's size had every cell been loaded as an object string."""
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        return int(column.memory_usage(deep=True, index=False))
+
+    # Bucket 0 counts the missing cells (code -1), the rest one per category
+    categories = column.cat.categories
+    counts = np.bincount(column.cat.codes.to_numpy() + 1, minlength=len(categories) + 1)
+    sizes = np.array([_NAN_BYTES] + [sys.getsizeof(value) for value in categories])
+    return 8 * len(column) + int(counts @ sizes)
+
+
+def _apply_header(df: pd.DataFrame, plan: HeaderPlan, columns) -> tuple:
+    """Name a block of parsed body rows and compact it according to `columns`.
+
+    Returns the frame and a report comparing its memory use with loading the
+    same cells as object strings.
+    """
+    names = [plan.names[i] for i in df.columns]
+    spec = columns(plan) if columns is not None else {}
+
+    object_bytes = 0
+    compacted = {}
+    for position, name in zip(df.columns, names):
+        column = df[position]
+        object_bytes += _object_bytes(column)
+        compacted[position] = _to_flags(column) if spec.get(name) == FLAG else column
+
+    # Building the frame in one go keeps all the flags in a single block
+    df = pd.DataFrame(compacted, index=df.index)
+    df.columns = names
+
+    compact_bytes = int(df.memory_usage(deep=True, index=False).sum())
+    memory = {
+        "columns_loaded": len(names),
+        "columns_skipped": len(plan.names) - len(names),
+        "object_bytes": object_bytes,
+        "compact_bytes": compact_bytes,
+        "saved_bytes": object_bytes - compact_bytes,
+    }
+    return df, memory
+
+
+def read_survey(input_file: str, columns=None, profiler=None) -> tuple:
+    """Load a whole raw export and return (body, header plan, memory report).
+
+    `columns` is a cleaner's `*_columns(plan)` function. When given, only the
+    columns it names are parsed, one-hot answers become boolean arrays and
+    repeated answers become categoricals. Without it every column is loaded
+    as text. Cells are never type-inferred, so the result does not depend on
+    how many rows pandas sees at once, which keeps it identical to streaming
+    mode. `profiler` times each step.
+    """
+    profiler = profiler or NO_PROFILER
+    with profiler.stage("read header"):
+        plan, offset = sniff_header(input_file)
+
+    # Parse the body once, starting after the metadata and header rows
+    with profiler.stage("read_csv") as run, open(input_file, "rb") as handle:
+        handle.seek(offset)
+        df = _read_body(handle, plan, columns)
+        run["rows"] = len(df)
+
+    with profiler.stage("compact columns", rows=len(df)):
+        df, memory = _apply_header(df, plan, columns)
+    return df, plan, memory
+
+
+class _RangeFile(io.RawIOBase):
+    """A read-only binary file over one byte range of a memory map, so a shard is parsed without copying it."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = min(max(base + offset, 0), len(self._view))
+        return self._position
+
+
+def shard_bounds(input_file: str, body_offset: int, shards: int) -> list:
+    """Split the body into at most `shards` (start, stop) byte ranges of about equal size.
+
+    Each range starts on a new record: a cut is moved forward to the next
+    line break that is not inside a quoted cell, found by counting quotes
+    from the start of the body.
+    """
+    size = os.path.getsize(input_file)
+    if shards <= 1 or size <= body_offset:
+        return [(body_offset, size)]
+
+    cuts = [body_offset]
+    with open(input_file, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as body:
+        position, quotes = body_offset, 0
+        for i in range(1, shards):
+            target = body_offset + (size - body_offset) * i // shards
+            if target > position:
+                quotes += body[position:target].count(b'"')
+                position = target
+            while position < size:
+                newline = body.find(b"\n", position)
+                stop = size if newline < 0 else newline + 1
+                quotes += body[position:stop].count(b'"')
+                position = stop
+                if quotes % 2 == 0:
+                    break
+            if position >= size:
+                break
+            cuts.append(position)
+    cuts.append(size)
+    return list(zip(cuts, cuts[1:]))
+
+
+def read_shard(input_file: str, plan: HeaderPlan, columns, start: int, stop: int) -> pd.DataFrame:
+    """Load the body rows in bytes `start` to `stop` of an export, as read_survey loads the whole body.
+
+    The export is memory-mapped, so processes reading different shards
+    share its pages instead of each holding a copy.
+    """
+    if stop <= start:
+        return _apply_header(_read_body(io.BytesIO(), plan, columns), plan, columns)[0]
+
+    with open(input_file, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as body:
+        view = memoryview(body)[start:stop]
+        try:
+            with io.BufferedReader(_RangeFile(view)) as shard:
+                df = _read_body(shard, plan, columns)
+        finally:
+            view.release()
+    return _apply_header(df, plan, columns)[0]
+
+
+def no_progress(stage: str, fraction: float):
+    """Default progress callback that ignores every report."""
+
+
+def iter_survey_chunks(input_file: str, columns=None, chunksize: int = CHUNK_SIZE, progress=None, profiler=None,
+                       keep=None):
+    """Yield (body chunk, header plan) pairs of at most `chunksize` rows.
+
+    `progress(stage, fraction)` is called after each chunk with the share of
+    the file read so far. `profiler` adds up the time spent per step. `keep`
+    limits the chunks to the body rows where it is True.
+    """
+    progress = progress or no_progress
+    profiler = profiler or NO_PROFILER
+    with profiler.stage("read header"):
+        plan, offset = sniff_header(input_file)
+    size = os.path.getsize(input_file) or 1
+
+    with open(input_file, "rb") as handle:
+        handle.seek(offset)
+        chunks = iter(_read_body(handle, plan, columns, chunksize, keep))
+        while True:
+            with profiler.stage("read_csv") as run:
+                chunk = next(chunks, None)
+                run["rows"] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+
+            with profiler.stage("compact columns", rows=len(chunk)):
+                chunk, _ = _apply_header(chunk, plan, columns)
+            yield chunk, plan
+            progress("Cleaning rows", min(handle.tell() / size, 1.0))
+
+
+def stream_clean(clean_frame, input_file: str, output_file: str, columns=None, chunksize: int = CHUNK_SIZE,
+                 progress=None, profiler=None, quality=None) -> int:
+    """Clean an export chunk by chunk, appending each result to `output_file`.
+
+    `clean_frame` and `columns` are one cleaner's `clean_*_frame` and
+    `*_columns` functions. Only one chunk is held in memory at a time and the
+    CSV written is byte-identical to saving the in-memory result. If cleaning
+    stops part-way, including when `progress` raises to cancel, the partial
+    output is removed. `profiler` adds up the time spent per step over all
+    chunks, and `quality` the data-quality counts. Returns the number of
+    rows written.
+    """
+    profiler = profiler or NO_PROFILER
+    rows = 0
+    try:
+        with open(output_file, "wb") as handle:
+            chunks = iter_survey_chunks(input_file, columns, chunksize, progress, profiler)
+            for i, (chunk, plan) in enumerate(chunks):
+                cleaned = clean_frame(chunk, plan, profiler=profiler, quality=quality)
+                with profiler.stage("write csv", rows=len(cleaned)):
+                    write_csv(cleaned, handle, header=(i == 0))
+                rows += len(cleaned)
+    except BaseException:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+    return rows
@@ -0,0 +1,361 @@
+"""Clean any survey described by a JSON schema in the `schemas` folder.
+
+A schema names the one-hot fields to decode and the options of each, the
+comment columns that replace 'Other'-style answers, the derived columns and
+the output order. It is compiled once per header layout into a SurveyPlan
+that holds every column the cleaning reads, so a chunk is decoded from a
+single boolean matrix whatever the survey.
+
+Each option in a field's `options` is one of:
+
+    "Column"                       the column is its own label
+    ["Column", "Label"]            a column with a different label
+    {"containing": [...], "label": "Label"}
+                                   ticked when any column containing one of
+                                   the words is ticked
+    {"containing": [...]}          every column containing one of the words,
+                                   labelled by its name without the `_NNN`
+                                   suffix
+    {"each_containing": [...]}     one option per text, ticked when any column
+                                   containing it is ticked
+    {"registry": "schools"}        one option per school of the shared
+                                   registry found in the header, with
+                                   "containing": [...] looking only at the
+                                   columns containing one of the words and
+                                   adding those not in the registry,
+                                   "only"/"exclude": [...] keeping or leaving
+                                   out the schools named, and "order":
+                                   "header" ranking them by header position
+                                   or [column, ...] ranking those columns
+                                   first, rather than registry order
+
+A field with `"canonicalize": true` matches typed answers, from comment and
+fallback columns, to its option labels (and to every registry school when it
+has a registry option), keeping an answer as typed when nothing is close.
+
+Agree/disagree grids need no fields. With a `likert` entry such as
+
+    "likert": {"scale": ["Strongly agree", ..., "Strongly disagree"], "scores": false}
+
+every block of `scale` columns in the merged header (`Statement.-Strongly
+agree`, `Agree_152`, ...) whose statement is an output column is decoded in
+one pass. With `"scores": true` each statement is followed by a
+`<statement> (score)` column from len(scale) for the first label down to 1.
+"""
+import re
+from functools import lru_cache, partial
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from canonical_names import get_canonicalizer
+from header_plan import PLAN_CACHE_SIZE, HeaderPlan, normalize_label
+from one_hot import first_selected, grouped_selection, selection_matrix
+from profiling import NO_PROFILER
+from schema_files import list_schemas, load_schema
+from school_registry import REGISTRY_ORDER, load_schools, school_options
+from survey_io import load_spec, read_survey
+
+DEFAULT_ANSWER = "Unknown"
+
+# Added to a Likert statement's name for its numeric score column
+SCORE_SUFFIX = " (score)"
+
+
+class FieldPlan(NamedTuple):
+    """How one decoded field is read from the selection matrix."""
+
+    name: str
+    groups: tuple  # per option, its columns' positions in SurveyPlan.flags
+    labels: tuple  # per option, (label, comment column or None)
+    default: str
+    fallback: str  # column used where nothing is ticked, or None
+    canonical: object  # Canonicalizer for typed answers, or None
+
+
+class LikertPlan(NamedTuple):
+    """Where every Likert grid of one header sits in the selection matrix."""
+
+    statements: tuple  # output names, one per grid
+    positions: np.ndarray  # statements x scale positions in SurveyPlan.flags
+    scale: tuple
+    default: str
+    scores: bool
+
+
+class SurveyPlan(NamedTuple):
+    """A schema compiled against one header layout."""
+
+    required_rows: list
+    flags: list  # every one-hot column read, in matrix order
+    fields: tuple
+    copies: dict
+    extracts: dict
+    constants: dict
+    output: list  # (output name, source column or field)
+    load: dict  # {column: load kind} for survey_io
+    likert: LikertPlan  # or None
+
+
+def strip_suffix(column: str) -> str:
+    """Remove the `_NNN` suffix that make_unique adds to repeated names."""
+    return column.rsplit("_", 1)[0]
+
+
+def expand_options(options: list, names: list) -> list:
+    """Turn a field's option entries into (columns, label) pairs for one header."""
+    expanded = []
+    for option in options:
+        if isinstance(option, str):
+            expanded.append(([option], option))
+        elif isinstance(option, list):
+            column, label = option
+            expanded.append(([column], label))
+        elif "registry" in option:
+            order = option.get("order", REGISTRY_ORDER)
+            expanded.extend(school_options(
+                tuple(names), tuple(option.get("containing", ())), tuple(option.get("only", ())),
+                tuple(option.get("exclude", ())), order if isinstance(order, str) else tuple(order),
+            ))
+        elif "each_containing" in option:
+            expanded.extend(([col for col in names if text in col], text) for text in option["each_containing"])
+        else:
+            matches = [col for col in names if any(word in col for word in option["containing"])]
+            if "label" in option:
+                expanded.append((matches, option["label"]))
+            else:
+                expanded.extend(([col], strip_suffix(col)) for col in matches)
+    return expanded
+
+
+def _grid_key(label: str) -> str:
+    """Return a label without its `_NNN` suffix, spacing, trailing full stop or case."""
+    return normalize_label(re.sub(r"_\d+$", "", label)).rstrip(". ").lower()
+
+
+def find_likert_blocks(names: list, scale: list) -> dict:
+    """Find each run of columns answering one statement on `scale`.
+
+    A run starts at a `<statement>-<first label>` column and carries on with
+    the other labels in order. Returns {statement key: the run's columns}.
+    """
+    keys = [_grid_key(label) for label in scale]
+    blocks = {}
+    for i, name in enumerate(names):
+        statement, dash, first = re.sub(r"_\d+$", "", name).rpartition("-")
+        if not dash or _grid_key(first) != keys[0]:
+            continue
+        run = names[i:i + len(scale)]
+        if [_grid_key(column) for column in run[1:]] == keys[1:]:
+            blocks.setdefault(_grid_key(statement), run)
+    return blocks
+
+
+def _compile_likert(schema: dict, plan: HeaderPlan, flags: dict) -> LikertPlan:
+    """Match the schema's output columns to the Likert blocks of the header."""
+    likert = schema.get("likert")
+    if not likert:
+        return None
+
+    blocks = find_likert_blocks(plan.names, likert["scale"])
+    derived = {*[field["name"] for field in schema["fields"]], *schema.get("copy", {}), *schema.get("extract", {}),
+               *schema.get("constants", {})}
+    statements = [
+        col for col in schema["output"]
+        if col not in derived and col not in plan and _grid_key(col) in blocks
+    ]
+    positions = np.array(
+        [[flags.setdefault(col, len(flags)) for col in blocks[_grid_key(col)]] for col in statements],
+        dtype=np.intp,
+    ).reshape(len(statements), len(likert["scale"]))
+    return LikertPlan(
+        tuple(statements), positions, tuple(likert["scale"]), likert.get("default", DEFAULT_ANSWER),
+        likert.get("scores", False),
+    )
+
+
+def _physical(plan: HeaderPlan, column: str) -> str:
+    """Return the header's spelling of `column`, or `column` itself when absent."""
+    return plan.resolve(column) if column in plan else column
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_schema(name: str, plan: HeaderPlan) -> SurveyPlan:
+    """Work out every column position and label a schema needs for one header.
+
+    Raises KeyError for a column a required field needs but the header lacks,
+    which happens before any body rows are parsed.
+    """
+    schema = load_schema(name)
+    present = set(plan.names)
+    comments = {
+        _physical(plan, option): _physical(plan, comment) for option, comment in schema.get("comments", {}).items()
+    }
+
+    flags = {}
+    fields = []
+    for field in schema["fields"]:
+        groups, labels, names = [], [], []
+        for columns, label in expand_options(field["options"], plan.names):
+            columns = [_physical(plan, col) for col in columns]
+            missing = [col for col in columns if col not in present]
+            if missing and field.get("required", True):
+                raise KeyError(f"{name} survey: column {missing[0]!r} for '{field['name']}' is not in the header")
+            columns = [col for col in columns if col in present]
+
+            comment = comments.get(columns[0]) if len(columns) == 1 else None
+            groups.append(tuple(flags.setdefault(col, len(flags)) for col in columns))
+            labels.append((label, comment if comment in present else None))
+            if not any(col in comments for col in columns):
+                names.append(label)
+
+        canonical = None
+        if field.get("canonicalize"):
+            if any(isinstance(option, dict) and "registry" in option for option in field["options"]):
+                names.extend(load_schools())
+            canonical = get_canonicalizer(tuple(dict.fromkeys(names)))
+
+        fallback = field.get("fallback")
+        fields.append(FieldPlan(
+            field["name"], tuple(groups), tuple(labels), field.get("default", DEFAULT_ANSWER),
+            _physical(plan, fallback) if fallback and fallback in plan else None, canonical,
+        ))
+
+    likert = _compile_likert(schema, plan, flags)
+
+    # Output columns are derived fields, or raw columns copied through as they are
+    derived = {
+        *[field.name for field in fields], *schema.get("copy", {}), *schema.get("extract", {}),
+        *schema.get("constants", {}), *(likert.statements if likert else ()),
+    }
+    output = []
+    for col in [*schema["output"], *schema.get("passthrough", [])]:
+        if col not in derived and col not in plan:
+            raise KeyError(f"{name} survey: output column {col!r} is not in the header")
+        output.append((col, col) if col in derived else (plan.resolve(col),) * 2)
+        if likert and likert.scores and col in likert.statements:
+            output.append((col + SCORE_SUFFIX,) * 2)
+
+    sources = [*schema.get("copy", {}).values(), *[source for source, _ in schema.get("extract", {}).values()]]
+    load = load_spec(
+        flags=list(flags),
+        categories=[_physical(plan, col) for col in schema.get("passthrough", [])],
+        text=[
+            *schema.get("required_rows", []), *schema.get("text", []), *sources,
+            *comments.values(), *[field.fallback for field in fields if field.fallback],
+        ],
+    )
+
+    return SurveyPlan(
+        schema.get("required_rows", []), list(flags), tuple(fields), schema.get("copy", {}),
+        schema.get("extract", {}), schema.get("constants", {}), output, load, likert,
+    )
+
+
+def schema_columns(name: str, plan: HeaderPlan) -> dict:
+    """Map every column a schema reads to how it is loaded."""
+    return compile_schema(name, plan).load
+
+
+def decode_field(df: pd.DataFrame, selected: np.ndarray, field: FieldPlan, quality=None) -> pd.Series:
+    """Resolve one field for every row from the shared selection matrix.
+
+    A QualityReport given as `quality` counts the rows left unanswered or
+    with several options ticked.
+    """
+    if all(len(group) == 1 for group in field.groups):
+        ticked = selected[:, [group[0] for group in field.groups]]
+    else:
+        ticked = grouped_selection(selected, field.groups)
+
+    labels = [df[comment] if comment else label for label, comment in field.labels]
+    result = first_selected(ticked, labels, field.default)
+
+    # Rows with nothing ticked may still have typed an answer
+    if field.fallback:
+        unanswered = result == field.default
+        result[unanswered] = df[field.fallback].to_numpy(dtype=object)[unanswered]
+
+    # Anything but a label was typed in
+    if field.canonical:
+        known = [label for label, comment in field.labels if not comment] + [field.default]
+        typed = pd.notna(result) & ~pd.Series(result).isin(known).to_numpy()
+        result[typed] = field.canonical.canonicalize(result[typed])
+
+    if quality is not None:
+        quality.add_field(field.name, ticked.sum(axis=1), pd.isna(result) | (result == field.default))
+    return pd.Series(result, index=df.index)
+
+
+def decode_likert(selected: np.ndarray, likert: LikertPlan, index: pd.Index, quality=None) -> dict:
+    """Decode every Likert grid at once; returns {column: values}, scores included when asked for."""
+    ticked = selected[:, likert.positions]  # rows x statements x scale
+    answered = ticked.any(axis=2)
+    choice = np.where(answered, ticked.argmax(axis=2), len(likert.scale))
+
+    if quality is not None:
+        ticks = ticked.sum(axis=2)
+        for i, statement in enumerate(likert.statements):
+            quality.add_field(statement, ticks[:, i], ~answered[:, i])
+
+    labels = np.array([*likert.scale, likert.default], dtype=object)[choice]
+    columns = {}
+    for i, statement in enumerate(likert.statements):
+        columns[statement] = pd.Series(labels[:, i], index=index)
+
+    if likert.scores:
+        points = pd.array([*range(len(likert.scale), 0, -1), None], dtype="Int64")
+        for i, statement in enumerate(likert.statements):
+            columns[statement + SCORE_SUFFIX] = pd.Series(points[choice[:, i]], index=index)
+    return columns
+
+
+def clean_schema_frame(name: str, df: pd.DataFrame, plan: HeaderPlan, profiler=None, quality=None) -> pd.DataFrame:
+    """Clean raw rows that already carry the header plan's column names.
+
+    `profiler` times the clean as a whole and each decoded field. `quality`,
+    a QualityReport, adds up the doubtful answers found while decoding.
+    """
+    profiler = profiler or NO_PROFILER
+    with profiler.stage("clean", rows=len(df)):
+        survey_plan = compile_schema(name, plan)
+
+        # Drop rows missing a required cell such as the first name
+        read = len(df)
+        df = df.dropna(subset=survey_plan.required_rows)
+        if quality is not None:
+            quality.add_rows(read, len(df), survey_plan.required_rows)
+
+        with profiler.stage("selection matrix", rows=len(df)):
+            selected = selection_matrix(df, survey_plan.flags)
+
+        columns = {}
+        for field in survey_plan.fields:
+            with profiler.stage(f"decode {field.name}", rows=len(df)):
+                columns[field.name] = decode_field(df, selected, field, quality)
+
+        if survey_plan.likert:
+            with profiler.stage("decode likert grids", rows=len(df)):
+                columns.update(decode_likert(selected, survey_plan.likert, df.index, quality))
+
+        with profiler.stage("derived columns", rows=len(df)):
+            for target, source in survey_plan.copies.items():
+                columns[target] = df[source]
+            for target, (source, pattern) in survey_plan.extracts.items():
+                columns[target] = df[source].str.extract(pattern, expand=False)
+                if quality is not None:
+                    quality.add_extract(target, columns[target].isna().sum())
+            for target, value in survey_plan.constants.items():
+                columns[target] = value
+
+        return pd.DataFrame(
+            {target: columns[source] if source in columns else df[source] for target, source in survey_plan.output},
+            index=df.index,
+        )
+
+
+def clean_schema(name: str, input_file: str, profiler=None, quality=None) -> pd.DataFrame:
+    """Clean a raw export of the schema's survey and return the processed DataFrame."""
+    df, plan, _ = read_survey(input_file, partial(schema_columns, name), profiler)
+    return clean_schema_frame(name, df, plan, profiler, quality)
@@ -0,0 +1,75 @@
+from functools import partial
+from typing import Callable, NamedTuple
+
+import pandas as pd
+
+from data_quality import QualityReport
+from survey_io import no_progress, read_survey
+from survey_schema import clean_schema, clean_schema_frame, list_schemas, load_schema, schema_columns
+
+
+class Survey(NamedTuple):
+    """The functions that clean one survey type."""
+
+    label: str
+    clean: Callable  # (input_file, profiler=None, quality=None) -> cleaned DataFrame
+    clean_frame: Callable  # (raw rows, header plan, profiler=None, quality=None) -> cleaned DataFrame
+    columns: Callable  # header plan -> {column: load kind}
+
+
+class CleaningResult(NamedTuple):
+    """A cleaned table together with what it cost to produce."""
+
+    frame: pd.DataFrame
+    memory: dict
+    profile: dict = None  # Profiler.report() when the run was profiled
+    quality: dict = None  # QualityReport.report() of the run
+
+
+def schema_survey(name: str) -> Survey:
+    """Build the cleaning functions of the survey described by schemas/<name>.json."""
+    return Survey(
+        load_schema(name)["label"], partial(clean_schema, name), partial(clean_schema_frame, name),
+        partial(schema_columns, name),
+    )
+
+
+# Every schema in the schemas folder is a survey type
+SURVEYS = {name: schema_survey(name) for name in list_schemas()}
+
+
+def plain_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Turn the categorical columns a cleaner loaded compactly back into plain text columns.
+
+    The frame then behaves like the original cleaners' output, e.g. under
+    `fillna("")` or a concat with frames of other categories.
+    """
+    categorical = [column for column, dtype in frame.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return frame
+    return frame.astype({column: frame[column].cat.categories.dtype for column in categorical})
+
+
+def run_survey(survey_type: str, input_file: str, progress=None, profiler=None, quality=None) -> CleaningResult:
+    """Clean an export of the given survey type and report the memory saved at load.
+
+    The frame has plain text columns, like the original per-survey cleaners.
+
+    `progress(stage, fraction)` is called as each stage starts. It may raise
+    to abandon the run. When a `profiler` is given, its report of the stages
+    so far is returned with the result. The data-quality counts always are,
+    and are also added to `quality` when one is given.
+    """
+    survey = SURVEYS[survey_type]
+    progress = progress or no_progress
+    quality = quality if quality is not None else QualityReport()
+
+    progress("Reading file", 0.0)
+    df, plan, memory = read_survey(input_file, survey.columns, profiler)
+    memory = {"survey_type": survey_type, **memory}
+
+    progress("Decoding answers", 0.6)
+    frame = plain_columns(survey.clean_frame(df, plan, profiler=profiler, quality=quality))
+
+    progress("Cleaned", 0.9)
+    return CleaningResult(frame, memory, profiler.report() if profiler else None, quality.report())
@@ -0,0 +1,36 @@
+"""Cleaning many exports into one output folder."""
+import os
+import shutil
+
+import pytest
+
+from batch_clean import clean_batch, colliding_outputs, main
+from benchmarks.generate_exports import write_export
+
+
+def test_inputs_with_the_same_name_are_refused_before_cleaning(tmp_path):
+    for term in ("term1", "term2"):
+        os.makedirs(tmp_path / term)
+        write_export("vce", str(tmp_path / term / "export.csv"), rows=20)
+    inputs = [str(tmp_path / "term1" / "export.csv"), str(tmp_path / "term2" / "export.csv")]
+    output_dir = str(tmp_path / "cleaned")
+
+    assert list(colliding_outputs(inputs, output_dir).values()) == [inputs]
+    with pytest.raises(ValueError, match="overwrite"):
+        clean_batch("vce", inputs, output_dir, workers=1)
+    with pytest.raises(SystemExit):
+        main(["--type", "vce", "--output", output_dir, *inputs])
+    assert not os.path.exists(output_dir)
+
+
+def test_inputs_with_different_names_are_cleaned(tmp_path):
+    write_export("vce", str(tmp_path / "export.csv"), rows=20)
+    shutil.copy(tmp_path / "export.csv", tmp_path / "export_term2.csv")
+    inputs = [str(tmp_path / "export.csv"), str(tmp_path / "export_term2.csv")]
+
+    assert colliding_outputs(inputs, str(tmp_path / "cleaned")) == {}
+    cleaned, failures = clean_batch("vce", inputs, str(tmp_path / "cleaned"), workers=1, use_cache=False)
+    assert failures == []
+    assert sorted(os.path.basename(save_path) for _, save_path, *_ in cleaned) == [
+        "export_cleaned.csv", "export_term2_cleaned.csv",
+    ]
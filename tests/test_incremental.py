@@ -0,0 +1,89 @@
+"""Incremental cleaning of growing exports."""
+import os
+
+import pandas as pd
+import pytest
+
+from batch_clean import clean_one
+from benchmarks.generate_exports import write_export
+from csv_engines import available_engines, using_engine
+from incremental import clean_incremental, index_path
+from surveys import run_survey
+
+HEADER_ROWS = 6
+
+
+def write_lines(path, lines):
+    with open(path, "wb") as handle:
+        handle.write(b"\r\n".join(lines) + b"\r\n")
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_blank_body_lines_do_not_shift_the_new_rows(tmp_path, engine):
+    source = tmp_path / "source.csv"
+    write_export("vce", str(source), rows=60)
+    lines = source.read_bytes().splitlines()
+    header, body = lines[:HEADER_ROWS], lines[HEADER_ROWS:]
+
+    export = tmp_path / "export.csv"
+    output = str(tmp_path / "export_cleaned.csv")
+    with using_engine(engine):
+        write_lines(export, header + [b""] + body[:10] + [b""] + body[10:30])
+        first = clean_incremental("vce", str(export), output)
+
+        write_lines(export, header + [b""] + body[:10] + [b""] + body[10:30] + [b"", b""] + body[30:])
+        run = clean_incremental("vce", str(export), output)
+        expected = run_survey("vce", str(export)).frame
+
+    cleaned = pd.read_csv(output, dtype=str, keep_default_na=False)
+    assert first.new_rows + run.new_rows == len(cleaned) == len(expected)
+    numbered = cleaned["Record Number"][cleaned["Record Number"] != ""]
+    assert not numbered.duplicated().any()
+    assert sorted(cleaned["Record Number"]) == sorted(expected["Record Number"].fillna("").astype(str))
+
+
+def test_a_full_clean_in_between_does_not_leave_a_stale_index(tmp_path):
+    source = tmp_path / "source.csv"
+    write_export("vce", str(source), rows=300)
+    lines = source.read_bytes().splitlines()
+    header, body = lines[:HEADER_ROWS], lines[HEADER_ROWS:]
+
+    export = tmp_path / "export.csv"
+    output = str(tmp_path / "export_cleaned.csv")
+
+    write_lines(export, header + body[:100])
+    clean_incremental("vce", str(export), output)
+
+    write_lines(export, header + body[:200])
+    assert clean_one("vce", str(export), str(tmp_path), use_cache=False)[0] == output
+    assert not os.path.exists(index_path(output))
+
+    write_lines(export, header + body)
+    clean_incremental("vce", str(export), output)
+    expected = run_survey("vce", str(export)).frame
+
+    cleaned = pd.read_csv(output, dtype=str, keep_default_na=False)
+    assert len(cleaned) == len(expected)
+    numbered = cleaned["Record Number"][cleaned["Record Number"] != ""]
+    assert not numbered.duplicated().any()
+
+
+def test_an_output_rewritten_elsewhere_is_rebuilt(tmp_path):
+    source = tmp_path / "source.csv"
+    write_export("vce", str(source), rows=200)
+    lines = source.read_bytes().splitlines()
+    header, body = lines[:HEADER_ROWS], lines[HEADER_ROWS:]
+
+    export = tmp_path / "export.csv"
+    output = tmp_path / "export_cleaned.csv"
+    write_lines(export, header + body[:100])
+    clean_incremental("vce", str(export), str(output))
+
+    # Another tool, or the app, saves over the output and leaves the index behind
+    run_survey("vce", str(export)).frame.head(10).to_csv(output, index=False)
+    assert os.path.exists(index_path(str(output)))
+
+    write_lines(export, header + body)
+    clean_incremental("vce", str(export), str(output))
+    cleaned = pd.read_csv(output, dtype=str, keep_default_na=False)
+    assert len(cleaned) == len(run_survey("vce", str(export)).frame)
@@ -0,0 +1,38 @@
+"""Which school wins when a respondent ticks more than one."""
+from schema_files import load_schema
+from survey_schema import expand_options
+
+BAYSWATER = "What school are you from? (If not listed, choose 'Other', and type your school name)-Bayswater Secondary College"
+
+
+def school_options_of(survey: str, names: list) -> list:
+    field = next(field for field in load_schema(survey)["fields"] if field["name"] == "School")
+    return expand_options(field["options"], names)
+
+
+def test_discovery_checks_its_columns_in_its_own_order_and_bayswater_last():
+    names = [BAYSWATER, "Wantirna College_73", "Emerald Primary School", "Wantirna College_180", "Other_193"]
+    assert school_options_of("discovery", names) == [
+        (["Wantirna College_73"], "Wantirna College"),
+        (["Emerald Primary School"], "Emerald Primary School"),
+        (["Wantirna College_180"], "Wantirna College"),
+        (["Other_193"], "Other"),
+        ([BAYSWATER], "Bayswater Secondary College"),
+    ]
+
+
+def test_vce_checks_bayswater_first_then_school_columns_in_header_order():
+    names = ["Caulfield Grammar", "St Kilda Park Primary School", "Ranges House_41", BAYSWATER, "Other_156"]
+    assert school_options_of("vce", names) == [
+        ([BAYSWATER], "Bayswater Secondary College"),
+        (["St Kilda Park Primary School"], "St Kilda Park Primary School"),
+        (["Ranges House_41"], "Ranges House"),
+        (["Other_156"], "Other"),
+    ]
+
+
+def test_vces_checks_schools_in_registry_order():
+    names = ["Emerald Primary School", "Wantirna College_73", "What School are you from?-Bayswater Secondary College"]
+    assert [label for _, label in school_options_of("vces", names)] == [
+        "Bayswater Secondary College", "Wantirna College", "Emerald Primary School", "Other",
+    ]
@@ -0,0 +1,182 @@
+"""Watch a shared folder and clean every raw export dropped into it.
+
+Example:
+    python watch_folder.py exports/ --output cleaned/ --workers 2
+
+The input folder is polled every few seconds. A CSV is cleaned once its
+size and modification time have stayed the same for `--settle` seconds and
+it can be opened, so a file still being copied in is left alone. Each file's
+survey type is detected from its header, unless --type is given, and
+it is cleaned by a fixed pool of worker processes that stay up between
+files, with pandas and the cleaners already loaded.
+
+A ledger (`.watch_ledger.json` in the output folder) records the size and
+modification time of every export cleaned or failed, so a restart skips
+them. A file is cleaned again only when it changes. Delete the ledger to
+clean everything again.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from batch_clean import clean_one, warm_pool
+from detect_survey import AUTO
+from output_formats import CSV, EXTENSIONS
+from surveys import SURVEYS
+
+LEDGER_NAME = ".watch_ledger.json"
+
+# Seconds between looks at the input folder
+POLL_SECONDS = 5
+
+# Seconds a file's size and modification time must hold still before it is cleaned
+SETTLE_SECONDS = 10
+
+CLEANED = "cleaned"
+FAILED = "failed"
+
+
+def scan(input_dir: str) -> dict:
+    """Return {file name: (size, modification time)} for the CSVs directly in `input_dir`.
+
+    Hidden files and Office lock files (`~$...`) are ignored.
+    """
+    found = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(".csv") or entry.name.startswith((".", "~$")):
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    found[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+    return found
+
+
+def can_open(path: str) -> bool:
+    """Tell whether a file can be opened for reading; one still being copied on Windows cannot."""
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class Ledger:
+    """The exports already handled, keyed by file name, kept as JSON in the output folder."""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as handle:
+                self.entries = json.load(handle)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def is_done(self, name: str, state: tuple) -> bool:
+        """Tell whether the file was cleaned, or failed, in exactly this state."""
+        entry = self.entries.get(name)
+        return entry is not None and (entry["size"], entry["mtime_ns"]) == tuple(state)
+
+    def record(self, name: str, state: tuple, **details):
+        self.entries[name] = {
+            "size": state[0], "mtime_ns": state[1], "finished": datetime.now().isoformat(timespec="seconds"),
+            **details,
+        }
+        self.save()
+
+    def save(self):
+        """Write the ledger, replacing the old one in one step."""
+        directory = os.path.dirname(self.path) or "."
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as temp:
+            json.dump(self.entries, temp, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def watch(input_dir: str, output_dir: str, survey_type: str = AUTO, workers: int = None,
+          interval: float = POLL_SECONDS, settle: float = SETTLE_SECONDS, fmt: str = CSV, once: bool = False):
+    """Clean new and changed exports in `input_dir` into `output_dir` until interrupted.
+
+    At most `workers` files (one per CPU by default) are cleaned at a time;
+    others wait for the next free worker. With `once` it returns as soon as
+    every file present has settled and been handled, e.g. for a scheduled task.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ledger = Ledger(os.path.join(output_dir, LEDGER_NAME))
+    workers = workers or os.cpu_count() or 1
+
+    settling = {}  # file name -> (file state, when that state was first seen)
+    running = {}  # future -> (file name, file state when submitted)
+    with warm_pool(workers) as pool:
+        while True:
+            now = time.monotonic()
+            busy = {name for name, _ in running.values()}
+            for name, state in scan(input_dir).items():
+                if name in busy or ledger.is_done(name, state):
+                    settling.pop(name, None)
+                    continue
+                if name not in settling or settling[name][0] != state:
+                    settling[name] = (state, now)
+                    continue
+
+                path = os.path.join(input_dir, name)
+                if now - settling[name][1] < settle or len(running) >= workers or not can_open(path):
+                    continue
+                del settling[name]
+                future = pool.submit(clean_one, survey_type, path, output_dir, fmt=fmt)
+                running[future] = (name, state)
+                print(f"cleaning {name}", flush=True)
+
+            for future in [future for future in running if future.done()]:
+                name, state = running.pop(future)
+                try:
+                    save_path, cleaned_type, rows, seconds = future.result()
+                except Exception as e:
+                    ledger.record(name, state, status=FAILED, error=f"{type(e).__name__}: {e}")
+                    print(f"FAILED  {name}: {e}", file=sys.stderr, flush=True)
+                else:
+                    ledger.record(
+                        name, state, status=CLEANED, output=save_path, survey_type=cleaned_type, rows=rows,
+                        seconds=round(seconds, 3),
+                    )
+                    print(f"cleaned {name} -> {save_path} ({cleaned_type}, {rows} rows, {seconds:.2f}s)", flush=True)
+
+            if once and not running and not settling:
+                return
+            time.sleep(interval)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Watch a folder and clean every KIOSC export dropped into it.")
+    parser.add_argument("input", help="folder the raw exports are dropped into")
+    parser.add_argument("--output", "-o", required=True, help="folder the cleaned files and the ledger go to")
+    parser.add_argument("--type", "-t", default=AUTO, choices=[AUTO, *sorted(SURVEYS)],
+                        help="survey type of every export (default: detect each file's type)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="files cleaned at the same time (default: one per CPU)")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS,
+                        help=f"seconds between looks at the folder (default: {POLL_SECONDS})")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help=f"seconds a file must stay unchanged before it is cleaned (default: {SETTLE_SECONDS})")
+    parser.add_argument("--format", "-f", default=CSV, choices=list(EXTENSIONS),
+                        help="file format of the cleaned files (default: csv)")
+    parser.add_argument("--once", action="store_true", help="clean what is there now, then exit")
+    args = parser.parse_args(argv)
+
+    print(f"watching {args.input} for exports, writing to {args.output} (Ctrl+C to stop)", flush=True)
+    try:
+        watch(args.input, args.output, args.type, args.workers, args.interval, args.settle, args.format, args.once)
+    except KeyboardInterrupt:
+        print("stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())